@@ -0,0 +1,62 @@
+"""Microbenchmark: MCP tool result serialization on the gateway's hot path.
+
+Compares the old json.loads(json.dumps(..., default=__dict__)) round-trip
+followed by json.dumps for SSE/history against normalize_call_tool_result
+followed by the gateway JSON codec.
+
+    python benchmarks/bench_tool_results.py
+"""
+import os
+import sys
+import json
+import time
+import base64
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.types import CallToolResult, TextContent, ImageContent  # noqa: E402
+
+from src.json_codec import dumps, orjson  # noqa: E402
+from src.mcp_result import normalize_call_tool_result  # noqa: E402
+
+
+def make_results():
+    rows = [{"id": i, "subject": f"Message {i}", "snippet": "lorem ipsum dolor sit amet " * 8} for i in range(500)]
+    image = base64.b64encode(os.urandom(256 * 1024)).decode("ascii")
+    return {
+        "500-row JSON text": CallToolResult(content=[TextContent(type="text", text=json.dumps(rows))], isError=False),
+        "200 text blocks": CallToolResult(
+            content=[TextContent(type="text", text=f"log line {i} " * 40) for i in range(200)], isError=False
+        ),
+        "256 KB image": CallToolResult(
+            content=[TextContent(type="text", text="screenshot"), ImageContent(type="image", data=image, mimeType="image/png")],
+            isError=False
+        ),
+    }
+
+
+def old_path(raw_result):
+    serialized = json.loads(json.dumps(raw_result, default=lambda o: getattr(o, "__dict__", str(o))))
+    return json.dumps(serialized), json.dumps(serialized)
+
+
+def new_path(raw_result):
+    wire = normalize_call_tool_result(raw_result)
+    return dumps(wire), dumps(wire)
+
+
+def bench(fn, raw_result, repeat=50):
+    fn(raw_result)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoded = fn(raw_result)
+    return (time.perf_counter() - start) / repeat * 1000, len(encoded[0])
+
+
+if __name__ == "__main__":
+    print(f"JSON encoder: {'orjson' if orjson else 'json (stdlib)'}")
+    print(f"{'result':<20} {'old ms':>9} {'new ms':>9} {'speedup':>8} {'old bytes':>10} {'new bytes':>10}")
+    for name, raw_result in make_results().items():
+        old_ms, old_bytes = bench(old_path, raw_result)
+        new_ms, new_bytes = bench(new_path, raw_result)
+        print(f"{name:<20} {old_ms:>9.3f} {new_ms:>9.3f} {old_ms / new_ms:>7.1f}x {old_bytes:>10} {new_bytes:>10}")
@@ -0,0 +1,79 @@
+"""Run the real run.py app for a load test, wired to stub servers.
+
+Started by load_test.py. The MCP server list comes from the
+LOADTEST_SERVERS_CONFIG environment variable (a JSON ServersConfig list),
+and LLM base URLs from OPENAI_BASE_URL / GEMINI_BASE_URL as usual. Also
+samples event-loop lag every --lag-interval seconds, served at
+GET /__loadtest/loop_lag (add ?reset=1 to start a new window).
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hypercorn.asyncio import serve  # noqa: E402
+from hypercorn.config import Config  # noqa: E402
+
+import src.client_and_server_config as gateway_config  # noqa: E402
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5051)
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--keep-rate-limits", action="store_true", help="leave LLM rate limit admission on")
+    return parser.parse_args(argv)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def main():
+    args = parse_args()
+    gateway_config.ServersConfig[:] = json.loads(os.environ["LOADTEST_SERVERS_CONFIG"])
+    if not args.keep_rate_limits:
+        # The stub LLM has no quota; admission would only measure the configured budgets
+        gateway_config.RateLimitConfig["enabled"] = False
+
+    import run  # noqa: E402  (after the config is patched)
+
+    lag_samples = []
+
+    async def sample_loop_lag():
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(args.lag_interval)
+            lag_samples.append(max(time.perf_counter() - started_at - args.lag_interval, 0.0))
+
+    @run.app.before_serving
+    async def start_lag_sampler():
+        run.app.loop_lag_task = asyncio.create_task(sample_loop_lag())
+
+    @run.app.route("/__loadtest/loop_lag", methods=["GET"])
+    async def loop_lag():
+        ordered = sorted(lag_samples)
+        report = {
+            "samples": len(ordered),
+            "p50": percentile(ordered, 0.50),
+            "p95": percentile(ordered, 0.95),
+            "p99": percentile(ordered, 0.99),
+            "max": ordered[-1] if ordered else None
+        }
+        if run.request.args.get("reset"):
+            lag_samples.clear()
+        return run.jsonify(report)
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{args.port}"]
+    asyncio.run(serve(run.app, config))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""End-to-end load test of the run.py pipeline, fully offline.
+
+Starts a stub LLM (stub_llm.py), the real gateway (gateway_under_test.py)
+with one stub stdio MCP server (stub_mcp_server.py) per server named in the
+payloads, then replays the test_payload*.json files at an open-loop Poisson
+arrival rate: requests are sent on schedule whether or not earlier ones have
+finished, so a slow gateway shows up as latency rather than a lower rate.
+
+Reports throughput, latency percentiles (and time to the first model token,
+the first MESSAGE-DELTA, for --endpoint stream), errors, and event-loop lag
+in the gateway and in the load generator. With --max-p95-ms /
+--max-error-rate it exits non-zero when a threshold is missed, for use as a
+pre-deploy regression check.
+
+    python benchmarks/load_test.py --rate 20 --duration 30 --client openai --tool-rounds 1
+"""
+import os
+import sys
+import copy
+import glob
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+
+import aiohttp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIENTS_DIR = os.path.dirname(BENCH_DIR)
+
+CLIENT_NAMES = {
+    "openai": "MCP_CLIENT_OPENAI",
+    "azure": "MCP_CLIENT_AZURE_AI",
+    "gemini": "MCP_CLIENT_GEMINI"
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second (Poisson arrivals)")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of traffic before measuring")
+    parser.add_argument("--payloads", default=os.path.join(CLIENTS_DIR, "test_payload*.json"))
+    parser.add_argument("--endpoint", choices=["message", "stream"], default="message")
+    parser.add_argument("--client", choices=["keep", "openai", "azure", "gemini"], default="keep",
+                        help="replace each payload's selected_client")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--allow-llm-cache", action="store_true", help="do not send X-LLM-Cache: bypass")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="leave gateway LLM rate limiting on")
+    # stub LLM
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--tools-per-round", type=int, default=2)
+    # stub MCP servers
+    parser.add_argument("--mcp-latency", type=float, default=0.05)
+    parser.add_argument("--mcp-jitter", type=float, default=0.02)
+    parser.add_argument("--mcp-payload-bytes", type=int, default=2048)
+    parser.add_argument("--mcp-pool-size", type=int, default=1)
+    # ports and output
+    parser.add_argument("--gateway-port", type=int, default=5051)
+    parser.add_argument("--llm-port", type=int, default=8799)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--log-dir", default=os.path.join(BENCH_DIR, ".loadtest"), help="stub and gateway logs")
+    parser.add_argument("--max-p95-ms", type=float, help="fail when p95 latency is above this")
+    parser.add_argument("--max-error-rate", type=float, help="fail when the error share is above this (0-1)")
+    return parser.parse_args(argv)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def load_payloads(args):
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    payloads = []
+    for path in sorted(glob.glob(args.payloads)):
+        with open(path, encoding="utf-8") as payload_file:
+            payload = json.load(payload_file)
+        if args.client != "keep":
+            payload["selected_client"] = CLIENT_NAMES[args.client]
+        # The stub servers take no credentials, but validation wants an entry per server
+        credentials = payload.setdefault("selected_server_credentials", {})
+        for server_name in payload.get("selected_servers", []):
+            credentials.setdefault(server_name, {})
+        client_details = payload.setdefault("client_details", {})
+        client_details.setdefault("api_key", "stub-key")
+        client_details.setdefault("chat_model", "stub-model")
+        if payload["selected_client"] == "MCP_CLIENT_AZURE_AI":
+            client_details.update(endpoint=llm_url, deployment_id="stub", api_version="2024-06-01")
+        payloads.append((os.path.basename(path), payload))
+    if not payloads:
+        raise SystemExit(f"No payloads match {args.payloads}")
+    return payloads
+
+
+def servers_config(args, payloads):
+    names = sorted({name for _, payload in payloads for name in payload.get("selected_servers", [])})
+    return [{
+        "server_name": name,
+        "command": sys.executable,
+        "args": [
+            os.path.join(BENCH_DIR, "stub_mcp_server.py"), "--name", name,
+            "--latency", str(args.mcp_latency), "--jitter", str(args.mcp_jitter),
+            "--payload-bytes", str(args.mcp_payload_bytes)
+        ],
+        "pool_size": args.mcp_pool_size
+    } for name in names]
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as probe:
+            if probe.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise SystemExit(f"Nothing listening on port {port} after {timeout}s")
+
+
+def start_processes(args, payloads):
+    os.makedirs(args.log_dir, exist_ok=True)
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    processes = []
+
+    llm_log = open(os.path.join(args.log_dir, "stub_llm.log"), "w")
+    processes.append(subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "stub_llm.py"), "--port", str(args.llm_port),
+        "--latency", str(args.llm_latency), "--jitter", str(args.llm_jitter),
+        "--tool-rounds", str(args.tool_rounds), "--tools-per-round", str(args.tools_per_round)
+    ], stdout=llm_log, stderr=subprocess.STDOUT))
+    wait_for_port(args.llm_port, 15)
+
+    env = dict(
+        os.environ,
+        LOADTEST_SERVERS_CONFIG=json.dumps(servers_config(args, payloads)),
+        OPENAI_BASE_URL=llm_url,
+        GEMINI_BASE_URL=llm_url,
+        TRACE_SAMPLE_RATE=os.environ.get("TRACE_SAMPLE_RATE", "0")
+    )
+    gateway_args = [sys.executable, os.path.join(BENCH_DIR, "gateway_under_test.py"), "--port", str(args.gateway_port)]
+    if args.keep_rate_limits:
+        gateway_args.append("--keep-rate-limits")
+    gateway_log = open(os.path.join(args.log_dir, "gateway.log"), "w")
+    processes.append(subprocess.Popen(gateway_args, cwd=CLIENTS_DIR, env=env, stdout=gateway_log, stderr=subprocess.STDOUT))
+    wait_for_port(args.gateway_port, 120)
+    return processes
+
+
+def stop_processes(processes):
+    for process in reversed(processes):
+        process.terminate()
+    for process in reversed(processes):
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class LoadGenerator:
+    def __init__(self, args, payloads):
+        self.args = args
+        self.payloads = payloads
+        self.base_url = f"http://127.0.0.1:{args.gateway_port}"
+        self.headers = {"Content-Type": "application/json"}
+        if not args.allow_llm_cache:
+            self.headers["X-LLM-Cache"] = "bypass"
+        self.results = []
+        self.lag_samples = []
+
+    async def send(self, session, index, record):
+        name, payload = self.payloads[index % len(self.payloads)]
+        body = copy.deepcopy(payload)
+        started_at = time.perf_counter()
+        result = {"payload": name, "ok": False, "error": None, "latency": None, "first_token": None}
+        try:
+            if self.args.endpoint == "message":
+                async with session.post(f"{self.base_url}/api/v1/mcp/process_message", json=body, headers=self.headers) as resp:
+                    data = await resp.json(content_type=None)
+                    result["ok"] = resp.status == 200 and bool(data.get("Status"))
+                    if not result["ok"]:
+                        result["error"] = f"HTTP {resp.status}: {str(data.get('Error'))[:200]}"
+            else:
+                async with session.post(f"{self.base_url}/api/v1/mcp/process_message_stream", json=body, headers=self.headers) as resp:
+                    final_status = None
+                    async for raw_line in resp.content:
+                        line = raw_line.decode("utf-8").strip()
+                        if not line.startswith("data:"):
+                            continue
+                        event = json.loads(line[len("data:"):])
+                        # Notifications (STARTED, tool calls) come first; time to the first model text
+                        if result["first_token"] is None and event.get("Action") == "MESSAGE-DELTA":
+                            result["first_token"] = time.perf_counter() - started_at
+                        if event.get("StreamingStatus") == "ERROR":
+                            result["error"] = str(event.get("Error"))[:200]
+                        final_status = event.get("StreamingStatus")
+                    result["ok"] = resp.status == 200 and final_status == "COMPLETED" and result["error"] is None
+                    if not result["ok"] and result["error"] is None:
+                        result["error"] = f"HTTP {resp.status}, stream ended with {final_status}"
+        except Exception as err:
+            # Bad JSON or a dropped connection fails this request only, never the whole run
+            result["error"] = f"{type(err).__name__}: {err}"
+        result["latency"] = time.perf_counter() - started_at
+        if record:
+            self.results.append(result)
+
+    async def sample_loop_lag(self, interval=0.01):
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag_samples.append(max(time.perf_counter() - started_at - interval, 0.0))
+
+    async def run_phase(self, session, seconds, record):
+        """Open loop: arrivals follow the schedule regardless of outstanding requests"""
+        tasks = []
+        started_at = time.perf_counter()
+        next_arrival = 0.0
+        index = 0
+        while next_arrival < seconds:
+            delay = started_at + next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.send(session, index, record)))
+            index += 1
+            next_arrival += random.expovariate(self.args.rate)
+        sent_for = time.perf_counter() - started_at
+        await asyncio.gather(*tasks)
+        return len(tasks), sent_for, time.perf_counter() - started_at
+
+    async def get_gateway_loop_lag(self, session, reset=False):
+        async with session.get(f"{self.base_url}/__loadtest/loop_lag", params={"reset": "1"} if reset else None) as resp:
+            return await resp.json()
+
+    async def run(self):
+        timeout = aiohttp.ClientTimeout(total=self.args.request_timeout)
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            if self.args.warmup > 0:
+                await self.run_phase(session, self.args.warmup, record=False)
+            await self.get_gateway_loop_lag(session, reset=True)
+            lag_task = asyncio.create_task(self.sample_loop_lag())
+            try:
+                sent, sent_for, elapsed = await self.run_phase(session, self.args.duration, record=True)
+            finally:
+                lag_task.cancel()
+            gateway_lag = await self.get_gateway_loop_lag(session)
+        return self.report(sent, sent_for, elapsed, gateway_lag)
+
+    def report(self, sent, sent_for, elapsed, gateway_lag):
+        latencies = sorted(r["latency"] for r in self.results if r["ok"])
+        first_tokens = sorted(r["first_token"] for r in self.results if r["ok"] and r["first_token"] is not None)
+        errors = {}
+        for r in self.results:
+            if not r["ok"]:
+                errors[r["error"]] = errors.get(r["error"], 0) + 1
+        client_lag = sorted(self.lag_samples)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 2)
+
+        return {
+            "config": {key: value for key, value in vars(self.args).items() if key not in ("output", "log_dir")},
+            "requests": sent,
+            "succeeded": len(latencies),
+            "failed": sent - len(latencies),
+            "error_rate": round((sent - len(latencies)) / sent, 4) if sent else 0.0,
+            "offered_rate": round(sent / sent_for, 2) if sent_for else 0.0,
+            "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": ms(percentile(latencies, 0.50)),
+                "p95": ms(percentile(latencies, 0.95)),
+                "p99": ms(percentile(latencies, 0.99)),
+                "max": ms(latencies[-1] if latencies else None)
+            },
+            "first_token_ms": {
+                "p50": ms(percentile(first_tokens, 0.50)),
+                "p95": ms(percentile(first_tokens, 0.95)),
+                "p99": ms(percentile(first_tokens, 0.99))
+            } if first_tokens else None,
+            "gateway_loop_lag_ms": {key: ms(gateway_lag[key]) for key in ("p50", "p95", "p99", "max")},
+            "load_generator_loop_lag_ms": {
+                "p50": ms(percentile(client_lag, 0.50)),
+                "p99": ms(percentile(client_lag, 0.99)),
+                "max": ms(client_lag[-1] if client_lag else None)
+            },
+            "errors": dict(sorted(errors.items(), key=lambda item: -item[1])[:10])
+        }
+
+
+def print_report(report):
+    latency, lag = report["latency_ms"], report["gateway_loop_lag_ms"]
+    print(f"\nrequests      {report['requests']} ({report['succeeded']} ok, {report['failed']} failed, "
+          f"error rate {report['error_rate']:.2%})")
+    print(f"offered rate  {report['offered_rate']} req/s")
+    print(f"throughput    {report['throughput']} req/s")
+    print(f"latency ms    p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    if report["first_token_ms"]:
+        first = report["first_token_ms"]
+        print(f"first token   p50 {first['p50']}  p95 {first['p95']}  p99 {first['p99']}")
+    print(f"gateway lag   p50 {lag['p50']}  p95 {lag['p95']}  p99 {lag['p99']}  max {lag['max']}")
+    client_lag = report["load_generator_loop_lag_ms"]
+    print(f"client lag    p50 {client_lag['p50']}  p99 {client_lag['p99']}  max {client_lag['max']}")
+    for error, count in report["errors"].items():
+        print(f"  {count:5d} x {error}")
+
+
+def check_thresholds(args, report):
+    failures = []
+    p95 = report["latency_ms"]["p95"]
+    if args.max_p95_ms is not None and (p95 is None or p95 > args.max_p95_ms):
+        failures.append(f"p95 latency {p95} ms is above {args.max_p95_ms} ms")
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {report['error_rate']} is above {args.max_error_rate}")
+    return failures
+
+
+def main():
+    args = parse_args()
+    payloads = load_payloads(args)
+    processes = start_processes(args, payloads)
+    try:
+        report = asyncio.run(LoadGenerator(args, payloads).run())
+    finally:
+        stop_processes(processes)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+    failures = check_thresholds(args, report)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""OpenAI-, Azure OpenAI- and Gemini-compatible stub LLM for load tests.
+
+Answers the gateway's tool-selection prompt by picking the first tools it
+lists, then plays a tool-call script: --tool-rounds rounds of
+--tools-per-round calls to tools from the request's tool list (arguments
+filled in from each tool's JSON schema), followed by a text answer.
+Responses wait --latency seconds (plus up to --jitter) before the first
+byte; streamed answers then send a chunk every --chunk-interval seconds.
+
+    python benchmarks/stub_llm.py --port 8799 --latency 0.3 --tool-rounds 1
+"""
+import re
+import json
+import random
+import asyncio
+import argparse
+
+from aiohttp import web
+
+_AVAILABLE_TOOLS_RE = re.compile(r"Available tools: (\[.*?\])\s*\n", re.S)
+
+
+def _argument_value(schema):
+    kind = schema.get("type")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    if kind == "array":
+        return []
+    if kind == "object":
+        return {}
+    return "machine learning"
+
+
+def _gemini_tools(body):
+    """Function declarations of a generateContent body, shaped like OpenAI tools for plan()"""
+    return [{"function": {"name": declaration.get("name"), "parameters": declaration.get("parameters") or {}}}
+            for tool in body.get("tools") or []
+            for declaration in tool.get("function_declarations") or tool.get("functionDeclarations") or []]
+
+
+def _tool_arguments(tool):
+    parameters = tool.get("function", {}).get("parameters") or {}
+    properties = parameters.get("properties") or {}
+    return {name: _argument_value(properties.get(name, {})) for name in parameters.get("required", [])}
+
+
+class StubLlm:
+    def __init__(self, args):
+        self.args = args
+        self.answer_words = ["The", "stub", "model", "found", "what", "you", "asked", "for."] * max(args.output_words // 8, 1)
+
+    async def wait_first_byte(self):
+        await asyncio.sleep(self.args.latency + random.uniform(0, self.args.jitter))
+
+    def plan(self, system_prompt, messages, tools):
+        """("select", text) | ("tools", [tool, ...]) | ("text", text) for one turn"""
+        if "determines the require tool" in system_prompt:
+            match = _AVAILABLE_TOOLS_RE.search(system_prompt)
+            names = [tool.get("function_name") for tool in json.loads(match.group(1))] if match else []
+            selected = ",".join(names[:self.args.tools_per_round]) or "none"
+            is_call = "TRUE" if names else "FALSE"
+            return "select", f"<function_call>{is_call}</function_call>\n<selected_tools>{selected}</selected_tools>"
+
+        rounds_done = sum(1 for text in messages if text.startswith("Executed tool:")) // max(self.args.tools_per_round, 1)
+        if tools and rounds_done < self.args.tool_rounds:
+            return "tools", [tools[i % len(tools)] for i in range(self.args.tools_per_round)]
+        return "text", " ".join(self.answer_words)
+
+    def usage(self, kind):
+        completion = len(self.answer_words) if kind == "text" else 20
+        return {"prompt_tokens": self.args.prompt_tokens, "completion_tokens": completion,
+                "total_tokens": self.args.prompt_tokens + completion}
+
+    # ----------------------------------------------------------- OpenAI / Azure
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        system_prompt = messages[0].get("content") or "" if messages else ""
+        contents = [m.get("content") or "" for m in messages]
+        kind, plan = self.plan(system_prompt, contents, body.get("tools") or [])
+        await self.wait_first_byte()
+
+        message = {"role": "assistant", "content": None}
+        if kind == "tools":
+            message["tool_calls"] = [{
+                "id": f"call_{random.getrandbits(48):x}",
+                "type": "function",
+                "function": {"name": tool["function"]["name"], "arguments": json.dumps(_tool_arguments(tool))}
+            } for tool in plan]
+        else:
+            message["content"] = plan
+
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "chatcmpl-stub", "object": "chat.completion", "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if kind == "tools" else "stop"}],
+                "usage": self.usage(kind)
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        if kind == "tools":
+            for index, call in enumerate(message["tool_calls"]):
+                await self._send_event(response, {"choices": [{"index": 0, "delta": {"tool_calls": [dict(call, index=index)]}}]})
+        else:
+            for word in plan.split(" "):
+                await self._send_event(response, {"choices": [{"index": 0, "delta": {"content": word + " "}}]})
+                await asyncio.sleep(self.args.chunk_interval)
+        await self._send_event(response, {"choices": [], "usage": self.usage(kind)})
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    # ------------------------------------------------------------------ Gemini
+
+    async def generate_content(self, request):
+        body = await request.json()
+        system_prompt = " ".join(part.get("text", "") for part in body.get("system_instruction", {}).get("parts", []))
+        contents = [part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])]
+        kind, plan = self.plan(system_prompt, contents, _gemini_tools(body))
+        await self.wait_first_byte()
+
+        usage = self.usage(kind)
+        usage_metadata = {"promptTokenCount": usage["prompt_tokens"], "candidatesTokenCount": usage["completion_tokens"],
+                          "totalTokenCount": usage["total_tokens"]}
+        if kind == "tools":
+            parts = [{"functionCall": {"name": tool["function"]["name"], "args": _tool_arguments(tool)}} for tool in plan]
+        else:
+            parts = [{"text": plan}]
+        if not request.path.endswith(":streamGenerateContent"):
+            return web.json_response({
+                "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}],
+                "usageMetadata": usage_metadata
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        if kind == "tools":
+            await self._send_event(response, {"candidates": [{"content": {"role": "model", "parts": parts}, "index": 0}]})
+        else:
+            for word in plan.split(" "):
+                await self._send_event(response, {"candidates": [{"content": {"role": "model", "parts": [{"text": word + " "}]}, "index": 0}]})
+                await asyncio.sleep(self.args.chunk_interval)
+        await self._send_event(response, {"candidates": [{"content": {"role": "model", "parts": []}, "finishReason": "STOP", "index": 0}],
+                                          "usageMetadata": usage_metadata})
+        return response
+
+    async def _send_event(self, response, data):
+        await response.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+
+
+def build_app(args) -> web.Application:
+    stub = StubLlm(args)
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/v1/chat/completions", stub.chat_completions)
+    app.router.add_post("/openai/deployments/{deployment}/chat/completions", stub.chat_completions)
+    app.router.add_post("/v1beta/models/{model_action}", stub.generate_content)
+    # Connection warm-up probes from the gateway
+    app.router.add_route("HEAD", "/{tail:.*}", lambda request: web.Response())
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.1, help="extra random latency, up to this many seconds")
+    parser.add_argument("--chunk-interval", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="tool-call turns before the text answer")
+    parser.add_argument("--tools-per-round", type=int, default=2)
+    parser.add_argument("--output-words", type=int, default=40)
+    parser.add_argument("--prompt-tokens", type=int, default=500, help="prompt_tokens reported in usage")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    web.run_app(build_app(args), host=args.host, port=args.port, access_log=None, print=None)
@@ -0,0 +1,59 @@
+"""Stdio MCP server for load tests with configurable tool latency and result size.
+
+    python benchmarks/stub_mcp_server.py --name MCP-PINECONE-DEV --latency 0.05 --payload-bytes 4096
+"""
+import sys
+import json
+import random
+import asyncio
+import argparse
+
+from mcp.server.fastmcp import FastMCP
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--name", default="stub")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per tool call")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random latency, up to this many seconds")
+    parser.add_argument("--payload-bytes", type=int, default=2048, help="approximate size of each tool result")
+    return parser.parse_args(argv)
+
+
+args = parse_args(sys.argv[1:])
+mcp = FastMCP(args.name)
+
+
+def _rows(query: str):
+    row = {"id": 0, "title": f"Result for {query}", "snippet": "lorem ipsum dolor sit amet " * 4}
+    count = max(args.payload_bytes // len(json.dumps(row)), 1)
+    return [dict(row, id=i) for i in range(count)]
+
+
+async def _work():
+    await asyncio.sleep(args.latency + random.uniform(0, args.jitter))
+
+
+@mcp.tool()
+async def search_documents(query: str, top_k: int = 5) -> str:
+    """Search documents in the index related to a query"""
+    await _work()
+    return json.dumps(_rows(query))
+
+
+@mcp.tool()
+async def get_document(document_id: str) -> str:
+    """Fetch one document by its id"""
+    await _work()
+    return json.dumps({"id": document_id, "rows": _rows(document_id)})
+
+
+@mcp.tool()
+async def list_records(limit: int = 10) -> str:
+    """List the latest records"""
+    await _work()
+    return json.dumps(_rows("latest")[:max(limit, 1)])
+
+
+if __name__ == "__main__":
+    mcp.run()
@@ -1,9 +1,8 @@
-from quart import Quart, request, jsonify, make_response, Response
-import json
+from quart import Quart, request, jsonify, make_response, Response, g
+from quart.json.provider import DefaultJSONProvider
 import asyncio
-import sys
+import base64
 import os
-import logging
 import time
 from typing import Optional, Dict, Any
 import pandas as pd
@@ -12,24 +11,40 @@ from hypercorn.asyncio import serve
 from hypercorn.config import Config
 from contextlib import AsyncExitStack
 from src.llm.azureopenai import azure_openai_processor
-from src.server_connection import initialize_all_mcp, MCPServers
+from src.llm.http_client import start_http_client, close_http_client
+from src.llm.azure_pool import get_deployment_stats
+from src.llm.response_cache import close_response_cache
+from src.server_connection import initialize_all_mcp, MCPServers, get_servers_health, refresh_tool_catalog, get_pool_stats
 from src.client_and_server_validation import client_and_server_validation
-from src.fixed_execution import client_and_server_execution
-import logging
+from src.client_and_server_execution import client_and_server_execution
+from src.chat_history import load_encoding
+from src.tool_router import get_router_metrics
+from src.json_codec import dumps, loads
+from src.mcp_result import get_blob
+from src.deadline import set_request_deadline, remaining_time
+from src.client_and_server_config import StreamingConfig, BatchConfig
+from src.batch_processing import run_batch
+from src.metrics import render_metrics, observe_request, HttpLatency, InFlightRequests, StreamDuration
+from src.tracing import trace_request, resolve_trace_id, span
+from src.structured_logging import setup_logging, shutdown_logging, get_logger, redact, should_log_payload
 
 
-# Configure clean logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-logger = logging.getLogger('api')
+# Structured logging, formatted and written from a background thread
+setup_logging()
+logger = get_logger("api")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify and request.get_json through the gateway's JSON codec"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return loads(s)
+
 
 app = Quart(__name__)
+app.json = FastJSONProvider(app)
 
 # Clean request logging middleware
 @app.before_request
@@ -40,73 +55,189 @@ async def log_request_start():
 @app.after_request
 async def log_request_complete(response):
     request_time = time.time() - request.start_time
-    logger.info(f"{request.method} {request.path} - {response.status_code} - {request_time:.3f}s")
+    logger.info("%s %s - %s - %.3fs", request.method, request.path, response.status_code, request_time)
+    # Route templates rather than raw paths keep label cardinality bounded
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    HttpLatency.observe(request_time, request.method, route, response.status_code)
+    if g.get("trace_id"):
+        response.headers["X-Trace-Id"] = g.trace_id
     return response
 
+
+def apply_request_headers(data: Dict[str, Any]):
+    """Copy per-request gateway options from headers into client_details"""
+    client_details = data.get("client_details")
+    if not isinstance(client_details, dict):
+        return
+    cache_control = request.headers.get("Cache-Control", "").lower()
+    if request.headers.get("X-LLM-Cache", "").lower() == "bypass" or "no-cache" in cache_control or "no-store" in cache_control:
+        client_details["llm_cache_bypass"] = True
+    if request.headers.get("X-Tenant-Id"):
+        client_details["tenant_id"] = request.headers.get("X-Tenant-Id")
+    set_request_deadline(client_details, request.headers.get("X-Request-Timeout"))
+
+
 app.mcp_exit_stack = None
 # Initialize the clients when the app starts
 @app.before_serving
 async def startup():
+    # The tiktoken encoding may need a download; load it off the event loop while the MCP servers start
+    encoding_task = asyncio.create_task(asyncio.to_thread(load_encoding))
     try:
+        await start_http_client()
         app.mcp_exit_stack = AsyncExitStack()
         await app.mcp_exit_stack.__aenter__()
-        print("\n✅ MCP servers initialization started.")
+        logger.info("MCP servers initialization started")
         success = await initialize_all_mcp(app.mcp_exit_stack)
         if success: 
-            print(f"\nAvailable servers: {list(MCPServers.keys())}")
-            print("\n✅ MCP servers initialized successfully.\n")
+            logger.info("MCP servers initialized", extra={"servers": list(MCPServers.keys())})
         else:
-            print("\n❌ Failed to initialize MCP clients.")
+            logger.error("Failed to initialize MCP clients")
         
     except Exception as err:
-        print(f"Error initializing MCP clients =========>>>> {err}")
+        logger.exception("Error initializing MCP clients: %s", err)
+    await encoding_task
+
+
+@app.route("/health", methods=["GET"])
+async def health():
+    """Per-server readiness and startup timings"""
+    return jsonify(get_servers_health()), 200
+
+
+@app.route("/api/v1/mcp/admin/refresh_tools", methods=["POST"])
+async def refresh_tools():
+    """Rebuild the tool catalog for one server (?server=NAME) or all of them"""
+    server_name = request.args.get("server")
+    if server_name and server_name not in MCPServers:
+        return jsonify({"Data": None, "Error": "Invalid Server", "Status": False}), 404
+    catalog = await refresh_tool_catalog(server_name)
+    return jsonify({"Data": catalog, "Error": None, "Status": True}), 200
+
+
+@app.route("/api/v1/mcp/router_metrics", methods=["GET"])
+async def router_metrics():
+    """Local tool router decisions and hit rate"""
+    return jsonify(get_router_metrics()), 200
+
+
+@app.route("/api/v1/mcp/pool_stats", methods=["GET"])
+async def pool_stats():
+    """Session pool utilization and queue depth per MCP server"""
+    return jsonify(get_pool_stats()), 200
+
+
+@app.route("/api/v1/llm/deployments", methods=["GET"])
+async def azure_deployments():
+    """Azure deployment pool members: calls in flight, weight, health and ejection time left"""
+    return jsonify(get_deployment_stats()), 200
+
+
+@app.route("/api/v1/mcp/blobs/<ref>", methods=["GET"])
+async def get_tool_result_blob(ref: str):
+    """Blob taken out of a tool result, by the blob_ref it was replaced with"""
+    blob = get_blob(ref)
+    if blob is None:
+        return jsonify({"Data": None, "Error": "Blob not found or expired", "Status": False}), 404
+    mime_type, data = blob
+    return Response(base64.b64decode(data), mimetype=mime_type or "application/octet-stream")
+
+
+@app.route("/metrics", methods=["GET"])
+async def metrics():
+    """Prometheus text exposition of gateway metrics"""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/api/v1/mcp/process_message", methods=["POST"])
 async def process_message():
+    InFlightRequests.inc("process_message")
     try:
-        print("DEBUG: process_message endpoint called", flush=True)
         data = await request.get_json()
         
-        # Set streaming to false
-        if "client_details" in data:
-            data["client_details"]["is_stream"] = False
+        async with trace_request("request.process_message", request.headers.get("X-Trace-Id"), force_sample=request.headers.get("X-Trace-Sample") == "1") as trace:
+            g.trace_id = trace.trace_id
+            # Set streaming to false
+            if "client_details" in data:
+                data["client_details"]["is_stream"] = False
+            apply_request_headers(data)
         
-        # Validation check
-        validation_result = await client_and_server_validation(data, {"streamCallbacks": None, "is_stream": False})
-        if not validation_result["status"]:
-            return jsonify({
-                "Data": None,
-                "Error": validation_result["error"],
-                "Status": False
-            }), 200
+            # Validation check
+            with span("validation"):
+                validation_result = await client_and_server_validation(data, {"streamCallbacks": None, "is_stream": False})
+            if not validation_result["status"]:
+                return jsonify({
+                    "Data": None,
+                    "Error": validation_result["error"],
+                    "Status": False
+                }), 200
             
-        print(f"\n✅ Validation Successful")
-        # print(validation_result)
-        print(f"\n✅ Execution Started")
-        
-        # Execution
-        generated_payload = validation_result["payload"]
-        print("\n✅ About to execute with payload:", generated_payload)
-        execution_response = await client_and_server_execution(generated_payload, {"streamCallbacks": None, "is_stream": False})
-        print("\n✅ Execution Response:", execution_response)
-        print("\n✅ Execution Response Type:", type(execution_response))
         
-        print(f"\n✅ Execution Completed")
-        response_dict = {
-            "Data": execution_response.Data if hasattr(execution_response, 'Data') else None,
-            "Error": execution_response.Error if hasattr(execution_response, 'Error') else None,
-            "Status": execution_response.Status if hasattr(execution_response, 'Status') else True
-        }
-        return jsonify(response_dict), 200
+            # Execution
+            generated_payload = validation_result["payload"]
+            if should_log_payload():
+                # Sampled on purpose, so logged at INFO rather than behind a DEBUG level check
+                logger.info("Executing payload", extra={"payload": redact(generated_payload)})
+            execution_response = await client_and_server_execution(generated_payload, {"streamCallbacks": None, "is_stream": False})
+            observe_request(generated_payload.get("selected_client", ""), execution_response.Data)
+            logger.info("Execution completed", extra={
+                "trace_id": trace.trace_id,
+                "status": execution_response.Status,
+                "llm_calls": execution_response.Data.get("total_llm_calls"),
+                "tool_calls": len(execution_response.Data.get("executed_tool_calls", []))
+            })
+            response_dict = {
+                "Data": execution_response.Data if hasattr(execution_response, 'Data') else None,
+                "Error": execution_response.Error if hasattr(execution_response, 'Error') else None,
+                "Status": execution_response.Status if hasattr(execution_response, 'Status') else True
+            }
+            return jsonify(response_dict), 200
     
     except Exception as error:
-        print(f"Error ========>>>>> {error}")
+        logger.exception("Request failed: %s", error)
         return jsonify({
             "Data": None,
             "Error": str(error),
             "Status": False
         }), 500
+    finally:
+        InFlightRequests.dec("process_message")
+
+
+@app.route("/api/v1/mcp/process_batch", methods=["POST"])
+async def process_batch():
+    """Run many process_message payloads; results stream back as NDJSON as each one finishes.
+
+    The body is a JSON array of payloads, or {"items": [...]}. Each output
+    line carries the item's "index" (and its "id" when the payload has one);
+    the last line is a {"summary": ...}.
+    """
+    data = await request.get_json()
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"Data": None, "Error": "Expected a non-empty array of payloads", "Status": False}), 400
+    if len(items) > BatchConfig["max_items"]:
+        return jsonify({"Data": None, "Error": f"Batch exceeds {BatchConfig['max_items']} items", "Status": False}), 400
+
+    for item in items:
+        if isinstance(item, dict):
+            apply_request_headers(item)
+    trace_id = resolve_trace_id(request.headers.get("X-Trace-Id"))
+    g.trace_id = trace_id
+    request_timeout = request.headers.get("X-Request-Timeout")
+
+    async def ndjson_generator():
+        InFlightRequests.inc("process_batch")
+        try:
+            async for line in run_batch(items, request_timeout, trace_id):
+                yield dumps(line) + "\n"
+        finally:
+            InFlightRequests.dec("process_batch")
+
+    response = Response(ndjson_generator(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+    # A batch runs as long as its items take; a client disconnect cancels it
+    response.timeout = None
+    return response
 
 
 class CustomStreamHandler:
@@ -115,7 +246,8 @@ class CustomStreamHandler:
     
     async def on_data(self, chunk: str):
         """Send data chunk to the stream"""
-        await self.response_queue.put(f"data: {chunk}\n\n")
+        with span("sse.emit", bytes=len(chunk)):
+            await self.response_queue.put(f"data: {chunk}\n\n")
     
     async def on_end(self):
         """Send completion message and end the stream"""
@@ -126,36 +258,55 @@ class CustomStreamHandler:
             "StreamingStatus": "COMPLETED",
             "Action": "NO-ACTION"
         }
-        await self.response_queue.put(f"data: {json.dumps(completion_data)}\n\n")
+        await self.response_queue.put(f"data: {dumps(completion_data)}\n\n")
         await self.response_queue.put(None)  # Signal end of stream
     
     async def on_error(self, error: Exception):
         """Send error message and end the stream"""
-        print(f"Streaming Error: {error}")
+        logger.error("Streaming error: %s", error)
         error_data = {"error": str(error)}
-        await self.response_queue.put(f"data: {json.dumps(error_data)}\n\n")
+        await self.response_queue.put(f"data: {dumps(error_data)}\n\n")
         await self.response_queue.put(None)  # Signal end of stream
 
-async def stream_generator(response_queue: asyncio.Queue):
-    """Generator function for streaming responses"""
-    while True:
-        try:
-            # Wait for data with a timeout to prevent hanging
-            data = await asyncio.wait_for(response_queue.get(), timeout=30.0)
+async def stream_generator(response_queue: asyncio.Queue, work: Optional[asyncio.Task] = None):
+    """Generator function for streaming responses.
+
+    Quiet gaps (long tool calls, slow LLM turns) are filled with SSE comment
+    heartbeats instead of ending the stream. The queue is bounded, so a slow
+    reader holds up the producer rather than growing the buffer. When the
+    stream ends early (client disconnect) the request's work task is
+    cancelled, which also cancels its in-flight LLM and tool calls.
+    """
+    started_at = time.perf_counter()
+    InFlightRequests.inc("process_message_stream")
+    try:
+        while True:
+            try:
+                data = await asyncio.wait_for(response_queue.get(), timeout=StreamingConfig["heartbeat_interval"])
+            except asyncio.TimeoutError:
+                if work is not None and work.done() and response_queue.empty():
+                    # The work ended without signalling the end of the stream
+                    break
+                # Writing the heartbeat is also how a dropped client is noticed
+                yield ": keep-alive\n\n"
+                continue
+            except Exception as e:
+                logger.error("Stream generator error: %s", e)
+                break
             if data is None:  # End of stream signal
                 break
             yield data
-        except asyncio.TimeoutError:
-            # Send keepalive or break on timeout
-            break
-        except Exception as e:
-            print(f"Stream generator error: {e}")
-            break
+    finally:
+        InFlightRequests.dec("process_message_stream")
+        StreamDuration.observe(time.perf_counter() - started_at)
+        if work is not None and not work.done():
+            logger.info("Stream closed before the response completed, cancelling request work")
+            work.cancel()
 
 @app.route('/api/v1/mcp/process_message_stream', methods=['POST'])
 async def process_message_stream():
-    # Create a queue for streaming responses
-    response_queue = asyncio.Queue()
+    # Bounded queue for streaming responses; producers wait when the client falls behind
+    response_queue = asyncio.Queue(StreamingConfig["queue_size"])
     custom_stream_handler = CustomStreamHandler(response_queue)
     
     try:
@@ -164,10 +315,11 @@ async def process_message_stream():
         if not data:
             data = {}
         
-        # Modify client details
+        # Modify client details; LLM text is streamed token by token
         if 'client_details' not in data:
             data['client_details'] = {}
-        data['client_details']['is_stream'] = False
+        data['client_details']['is_stream'] = True
+        apply_request_headers(data)
         
         # Start streaming response
         async def generate_response():
@@ -180,10 +332,11 @@ async def process_message_stream():
                     "StreamingStatus": "STARTED",
                     "Action": "NO-ACTION"
                 }
-                await custom_stream_handler.on_data(json.dumps(start_data))
+                await custom_stream_handler.on_data(dumps(start_data))
                 
                 # =========================================== validation check start =============================================================
-                validation_result = await client_and_server_validation(data, {"streamCallbacks": custom_stream_handler, "is_stream": True})
+                with span("validation"):
+                    validation_result = await client_and_server_validation(data, {"streamCallbacks": custom_stream_handler, "is_stream": True})
                 
                 if not validation_result.get('status', False):
                     error_data = {
@@ -193,7 +346,7 @@ async def process_message_stream():
                         "StreamingStatus": "ERROR",
                         "Action": "ERROR"
                     }
-                    await custom_stream_handler.on_data(json.dumps(error_data))
+                    await custom_stream_handler.on_data(dumps(error_data))
                     await custom_stream_handler.on_end()
                     return
                 # =========================================== validation check end =============================================================
@@ -201,8 +354,14 @@ async def process_message_stream():
                 # =========================================== execution start ====================================================================
                 generated_payload = validation_result.get('payload')
                 execution_response = await client_and_server_execution(generated_payload, {"streamCallbacks": custom_stream_handler, "is_stream": True})
+                observe_request(generated_payload.get("selected_client", ""), execution_response.Data)
                 # =========================================== execution end ======================================================================
-                print(f"\n✅ ------------------------" , execution_response.Data)
+                logger.info("Execution completed", extra={
+                    "trace_id": trace_id,
+                    "status": execution_response.Status,
+                    "llm_calls": execution_response.Data.get("total_llm_calls"),
+                    "tool_calls": len(execution_response.Data.get("executed_tool_calls", []))
+                })
                 if hasattr(execution_response, 'Status') and not execution_response.Status:
                     error_data = {
                         "Data": execution_response.Data if hasattr(execution_response, 'Data') else None,
@@ -211,7 +370,7 @@ async def process_message_stream():
                         "StreamingStatus": "ERROR",
                         "Action": "ERROR"
                     }
-                    await custom_stream_handler.on_data(json.dumps(error_data))
+                    await custom_stream_handler.on_data(dumps(error_data))
                     await custom_stream_handler.on_end()
                     return
                 
@@ -223,11 +382,11 @@ async def process_message_stream():
                     "StreamingStatus": "IN-PROGRESS",
                     "Action": "AI-RESPONSE"
                 }
-                await custom_stream_handler.on_data(json.dumps(success_data))
+                await custom_stream_handler.on_data(dumps(success_data))
                 await custom_stream_handler.on_end()
                 
             except Exception as error:
-                print(f"Error ========>>>>> {error}")
+                logger.exception("Request failed: %s", error)
                 error_data = {
                     "Data": None,
                     "Error": str(error),
@@ -235,26 +394,39 @@ async def process_message_stream():
                     "StreamingStatus": "ERROR",
                     "Action": "ERROR"
                 }
-                await custom_stream_handler.on_data(json.dumps(error_data))
+                await custom_stream_handler.on_data(dumps(error_data))
                 await custom_stream_handler.on_end()
         
+        trace_id = resolve_trace_id(request.headers.get("X-Trace-Id"))
+        force_sample = request.headers.get("X-Trace-Sample") == "1"
+        g.trace_id = trace_id
+
+        async def traced_generate_response():
+            async with trace_request("request.process_message_stream", trace_id, force_sample=force_sample):
+                await generate_response()
+
         # Start the response generation in the background
-        asyncio.create_task(generate_response())
+        work = asyncio.create_task(traced_generate_response())
         
         # Return streaming response
-        return Response(
-            stream_generator(response_queue),
+        response = Response(
+            stream_generator(response_queue, work),
             mimetype='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
                 'Connection': 'keep-alive',
+                'X-Accel-Buffering': 'no',
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Headers': 'Content-Type'
             }
         )
+        # Quart would otherwise cut the stream off after RESPONSE_TIMEOUT (60s)
+        remaining = remaining_time(data["client_details"])
+        response.timeout = max(remaining or 0, 0) + StreamingConfig["close_grace"]
+        return response
         
     except Exception as error:
-        print(f"Error ========>>>>> {error}")
+        logger.exception("Request failed: %s", error)
         
         # Send error response immediately
         error_data = {
@@ -266,7 +438,7 @@ async def process_message_stream():
         }
         
         async def error_generator():
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield f"data: {dumps(error_data)}\n\n"
         
         return Response(
             error_generator(),
@@ -280,10 +452,13 @@ async def process_message_stream():
 
 @app.after_serving
 async def shutdown():
+    await close_http_client()
+    close_response_cache()
     if app.mcp_exit_stack:
         await app.mcp_exit_stack.__aexit__(None, None, None)
         app.mcp_exit_stack = None
-        print("\n✅ MCP servers cleaned up on shutdown.\n")
+        logger.info("MCP servers cleaned up on shutdown")
+    shutdown_logging()
     
 if __name__ == "__main__":
     # Create a config instance
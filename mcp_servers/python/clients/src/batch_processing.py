@@ -0,0 +1,103 @@
+import time
+import asyncio
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+from src.client_and_server_config import BatchConfig
+from src.client_and_server_validation import client_and_server_validation
+from src.client_and_server_execution import client_and_server_execution
+from src.deadline import set_request_deadline
+from src.metrics import observe_request
+from src.tracing import trace_request, span
+from src.structured_logging import get_logger
+
+logger = get_logger("api")
+
+
+# Batch execution for /api/v1/mcp/process_batch. Each item goes through the
+# same validation and execution as /process_message; the slot limits are
+# shared by every batch in the process, so two large batches do not double
+# the load on a provider.
+
+_global_slots: Optional[asyncio.Semaphore] = None
+_client_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def _get_slots(selected_client: str):
+    global _global_slots
+    if _global_slots is None:
+        _global_slots = asyncio.Semaphore(BatchConfig["max_concurrency"])
+    if selected_client not in _client_slots:
+        limit = BatchConfig["per_client"].get(selected_client, BatchConfig["default_per_client"])
+        _client_slots[selected_client] = asyncio.Semaphore(limit)
+    return _global_slots, _client_slots[selected_client]
+
+
+async def _run_item(index: int, item: Any, request_timeout: Optional[Any], trace_id: str) -> Dict[str, Any]:
+    line: Dict[str, Any] = {"index": index}
+    if isinstance(item, dict) and "id" in item:
+        line["id"] = item["id"]
+    if not isinstance(item, dict) or not isinstance(item.get("client_details"), dict):
+        line.update({"Data": None, "Error": "Invalid Request Payload", "Status": False})
+        return line
+
+    global_slots, client_slots = _get_slots(item.get("selected_client", ""))
+    started_at = time.perf_counter()
+    # Provider slot first, so items queued behind a busy provider do not hold global slots
+    async with client_slots, global_slots:
+        line["queued_seconds"] = round(time.perf_counter() - started_at, 3)
+        # The deadline covers the item's own run, not its time in the queue
+        set_request_deadline(item["client_details"], request_timeout)
+        item["client_details"]["is_stream"] = False
+        try:
+            # Each item gets its own trace, tagged with the batch request's trace id
+            async with trace_request("request.process_batch_item", index=index, batch_trace_id=trace_id) as trace:
+                line["trace_id"] = trace.trace_id
+                with span("validation"):
+                    validation_result = await client_and_server_validation(item, {"streamCallbacks": None, "is_stream": False})
+                if not validation_result["status"]:
+                    line.update({"Data": None, "Error": validation_result["error"], "Status": False})
+                    return line
+
+                generated_payload = validation_result["payload"]
+                execution_response = await client_and_server_execution(generated_payload, {"streamCallbacks": None, "is_stream": False})
+                observe_request(generated_payload.get("selected_client", ""), execution_response.Data)
+                line.update({
+                    "Data": execution_response.Data,
+                    "Error": execution_response.Error,
+                    "Status": execution_response.Status
+                })
+        except Exception as err:
+            logger.exception("Batch item %d failed: %s", index, err)
+            line.update({"Data": None, "Error": str(err), "Status": False})
+        finally:
+            line["duration_seconds"] = round(time.perf_counter() - started_at - line["queued_seconds"], 3)
+    return line
+
+
+async def run_batch(items: List[Any], request_timeout: Optional[Any] = None, trace_id: str = "") -> AsyncIterator[Dict[str, Any]]:
+    """Run every item and yield its result as soon as it finishes, then a summary.
+
+    Items keep their position as "index" (and echo an "id" when given) since
+    results arrive in completion order. Closing the generator early, e.g.
+    on client disconnect, cancels the items still running or queued.
+    """
+    started_at = time.perf_counter()
+    tasks = [asyncio.create_task(_run_item(index, item, request_timeout, trace_id)) for index, item in enumerate(items)]
+    succeeded = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            succeeded += bool(line.get("Status"))
+            yield line
+        yield {
+            "summary": {
+                "total": len(items),
+                "succeeded": succeeded,
+                "failed": len(items) - succeeded,
+                "duration_seconds": round(time.perf_counter() - started_at, 3)
+            }
+        }
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,142 @@
+import re
+import json
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+from src.client_and_server_config import ChatHistoryConfig
+from src.structured_logging import get_logger
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to a character estimate
+    tiktoken = None
+
+logger = get_logger("cache")
+
+
+_encoding = None
+_TOOL_RESULT_RE = re.compile(r"^Executed tool: (\S+) and the result is: ", re.S)
+
+
+def load_encoding():
+    """Load the tiktoken encoding, which may download its BPE file.
+
+    Blocking: run it off the event loop at startup (run.py does so with
+    asyncio.to_thread). Until it has loaded, token counts are estimated.
+    """
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding(ChatHistoryConfig["encoding"])
+        except Exception as err:
+            logger.warning("tiktoken encoding unavailable, estimating token counts: %s", err)
+            _encoding = False
+
+
+def _get_encoding():
+    # Never loaded on the request path; see load_encoding
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    # Only short texts (chat messages) are memoized; large tool results would pin memory
+    if len(text) <= 65536:
+        return _count_tokens_cached(text)
+    return _count_tokens(text)
+
+
+@lru_cache(maxsize=4096)
+def _count_tokens_cached(text: str) -> int:
+    return _count_tokens(text)
+
+
+def _count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _tool_result_stub(message: Dict[str, Any]) -> Dict[str, Any]:
+    content = message.get("content") or ""
+    match = _TOOL_RESULT_RE.match(content)
+    result_text = content[match.end():]
+    preview = result_text[:ChatHistoryConfig["tool_stub_max_chars"]]
+    return {
+        "role": message.get("role", "assistant"),
+        "content": f"Executed tool: {match.group(1)} (earlier result compacted, "
+                   f"{count_tokens(result_text)} tokens omitted). Preview: {preview}"
+    }
+
+
+def compact_chat_history(
+    chat_history: List[Dict[str, Any]],
+    fixed_tokens: int,
+    max_prompt_tokens: int,
+    keep_recent_messages: int
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Fit chat_history into the prompt budget without mutating it.
+
+    The most recent messages are kept verbatim. Older tool results are
+    collapsed into stubs first, then the oldest messages are dropped. If the
+    recent window alone is still over budget, its tool results are stubbed
+    too. The latest user message is always kept. Returns the compacted
+    history and its estimated prompt token count.
+    """
+    messages = list(chat_history)
+    counts = [count_tokens(message.get("content") or "") for message in messages]
+    total = fixed_tokens + sum(counts)
+    if total <= max_prompt_tokens:
+        return messages, total
+
+    recent_start = max(len(messages) - keep_recent_messages, 0)
+
+    def stub_tool_results(start: int, end: int):
+        nonlocal total
+        for index in range(start, end):
+            if total <= max_prompt_tokens:
+                return
+            if _TOOL_RESULT_RE.match(messages[index].get("content") or ""):
+                messages[index] = _tool_result_stub(messages[index])
+                new_count = count_tokens(messages[index]["content"])
+                total += new_count - counts[index]
+                counts[index] = new_count
+
+    stub_tool_results(0, recent_start)
+
+    # The latest user message is the question being answered; it is never dropped
+    pinned = max((i for i, message in enumerate(messages) if message.get("role") == "user"), default=-1)
+    drop_index = 0
+    while total > max_prompt_tokens and drop_index < recent_start:
+        if drop_index == pinned:
+            drop_index += 1
+            continue
+        total -= counts.pop(drop_index)
+        messages.pop(drop_index)
+        recent_start -= 1
+        if pinned > drop_index:
+            pinned -= 1
+
+    stub_tool_results(recent_start, len(messages))
+    return messages, total
+
+
+def fit_prompt_budget(client_details: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Copy of client_details whose chat_history fits ChatHistoryConfig's prompt budget"""
+    fixed_tokens = count_tokens(client_details.get("prompt") or "")
+    if client_details.get("tools"):
+        fixed_tokens += count_tokens(json.dumps(client_details["tools"]))
+
+    if not ChatHistoryConfig["enabled"]:
+        history_tokens = sum(count_tokens(m.get("content") or "") for m in client_details.get("chat_history", []))
+        return client_details, fixed_tokens + history_tokens
+
+    chat_history, prompt_tokens = compact_chat_history(
+        client_details.get("chat_history", []),
+        fixed_tokens,
+        ChatHistoryConfig["max_prompt_tokens"],
+        ChatHistoryConfig["keep_recent_messages"]
+    )
+    return dict(client_details, chat_history=chat_history), prompt_tokens
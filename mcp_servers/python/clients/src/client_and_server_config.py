@@ -1,8 +1,257 @@
+import os
+import json
+
 ClientsConfig =[
     "MCP_CLIENT_AZURE_AI",
     "MCP_CLIENT_OPENAI",
 	"MCP_CLIENT_GEMINI"
 ]
+# Defaults for MCP server startup. A ServersConfig entry may override
+# "startup_timeout" (seconds) for servers that are slow to spawn.
+ServerStartupConfig = {
+	"startup_timeout": 30,
+	"retry_initial_delay": 2,
+	"retry_max_delay": 60
+}
+
+# Health probes for live MCP sessions. A session that misses max_missed_pings
+# pings in a row, or whose transport has closed, is torn down and restarted
+# in place.
+ServerSupervisorConfig = {
+	"ping_interval": 15,
+	"ping_timeout": 5,
+	"max_missed_pings": 2
+}
+
+# Per-request deadline in seconds, taken from the X-Request-Timeout header or
+# client_details.request_timeout, capped at max_timeout. Every LLM and tool
+# call gets whatever time is left.
+RequestDeadlineConfig = {
+	"default_timeout": 300,
+	"max_timeout": 900
+}
+
+# SSE streaming. An SSE comment line is sent after heartbeat_interval seconds
+# without output so proxies and clients keep the connection open. Up to
+# queue_size events are buffered per stream; beyond that the request's work
+# waits for the client to read. A stream stays open until the request
+# deadline plus close_grace seconds.
+StreamingConfig = {
+	"heartbeat_interval": float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15")),
+	"queue_size": 256,
+	"close_grace": 30
+}
+
+# Request tracing. Every request gets a trace id (X-Trace-Id is honored and
+# echoed back); a sample_rate share of requests, plus any sent with
+# "X-Trace-Sample: 1", have their spans written to export_dir as Chrome trace
+# files ("chrome") or plain span lists ("json").
+TracingConfig = {
+	"enabled": os.getenv("TRACING_ENABLED", "true").lower() == "true",
+	"sample_rate": float(os.getenv("TRACE_SAMPLE_RATE", "0.01")),
+	"export_dir": os.getenv("TRACE_EXPORT_DIR", ".traces"),
+	"format": os.getenv("TRACE_FORMAT", "chrome"),
+	"max_spans_per_trace": 5000
+}
+
+# Structured logging, written from a background thread. Components log as
+# "gateway.<component>" with their own levels: LOG_LEVEL_<COMPONENT> (e.g.
+# LOG_LEVEL_LLM=DEBUG) sets one component, LOG_LEVEL sets every component
+# without its own variable and the root logger. Request payloads are logged
+# (redacted and size-capped) for a payload_sample_rate share of requests,
+# whatever the component levels.
+LoggingConfig = {
+	"level": os.getenv("LOG_LEVEL", "INFO"),
+	"format": os.getenv("LOG_FORMAT", "json"),
+	"components": {
+		"api": os.getenv("LOG_LEVEL_API", os.getenv("LOG_LEVEL", "INFO")),
+		"validation": os.getenv("LOG_LEVEL_VALIDATION", os.getenv("LOG_LEVEL", "INFO")),
+		"execution": os.getenv("LOG_LEVEL_EXECUTION", os.getenv("LOG_LEVEL", "INFO")),
+		"llm": os.getenv("LOG_LEVEL_LLM", os.getenv("LOG_LEVEL", "INFO")),
+		"mcp": os.getenv("LOG_LEVEL_MCP", os.getenv("LOG_LEVEL", "INFO")),
+		"cache": os.getenv("LOG_LEVEL_CACHE", os.getenv("LOG_LEVEL", "WARNING")),
+		"tracing": os.getenv("LOG_LEVEL_TRACING", os.getenv("LOG_LEVEL", "WARNING"))
+	},
+	"payload_sample_rate": float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0")),
+	"max_field_chars": 2000,
+	"max_list_items": 50,
+	"queue_size": 10000
+}
+
+# Shared async HTTP sessions used by the LLM adapters, one per provider base URL.
+# Timeouts are in seconds; base URLs listed here are warmed on startup.
+LlmHttpClientConfig = {
+	"pool_limit": 100,
+	"pool_limit_per_host": 32,
+	"keepalive_timeout": 30,
+	"ttl_dns_cache": 300,
+	"warm_up_timeout": 5,
+	"base_urls": {
+		"openai": os.getenv("OPENAI_BASE_URL", "https://api.openai.com"),
+		"gemini": os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+	},
+	"timeouts": {
+		"default": 60,
+		"openai": 60,
+		"azure_openai": 60,
+		"gemini": 60
+	}
+}
+
+# Azure OpenAI deployment pool, as a JSON list in AZURE_OPENAI_DEPLOYMENTS of
+# {"name", "endpoint", "deployment_id", "api_key", "api_version", "weight"};
+# requests cannot supply their own. Each member gets its own RateLimitConfig
+# azure_openai key budget. When set, each Azure
+# call goes to the member with the fewest calls in flight for its weight and
+# health score instead of the single endpoint/deployment_id in client_details,
+# and moves on to the next member if one answers 429 or 5xx. A member that
+# answers 429 is ejected for its Retry-After (or ejection_seconds, doubling up
+# to max_ejection_seconds while it keeps failing); 5xx and connection errors
+# only lower its health.
+AzureDeploymentPoolConfig = {
+	"deployments": json.loads(os.getenv("AZURE_OPENAI_DEPLOYMENTS", "[]")),
+	"ejection_seconds": 10,
+	"max_ejection_seconds": 120,
+	"health_decay": 0.2,
+	"min_health": 0.1
+}
+
+# Tool calls from one LLM turn run concurrently, capped per MCP server.
+# A ServersConfig entry may override the cap with "max_concurrent_tool_calls"
+# and run several sessions (child processes) with "pool_size".
+ToolExecutionConfig = {
+	"max_concurrent_tool_calls_per_server": 4,
+	"default_pool_size": 1
+}
+
+# Token-bucket admission for LLM calls, per minute. Every provider API key
+# gets its provider's rpm/tpm budget (for the Azure deployment pool, each
+# member's key gets its own), and every tenant (X-Tenant-Id or
+# client_details.tenant_id) gets the tenant budget or its entry in
+# tenant_overrides. A call that would overspend waits for the budget to
+# refill rather than failing, for as long as its request deadline allows.
+# A limit of 0 is unlimited.
+RateLimitConfig = {
+	"enabled": os.getenv("LLM_RATE_LIMIT_ENABLED", "true").lower() == "true",
+	"providers": {
+		"openai": {"rpm": 500, "tpm": 200000},
+		"azure_openai": {"rpm": 300, "tpm": 120000},
+		"gemini": {"rpm": 300, "tpm": 250000}
+	},
+	"tenant": {"rpm": 120, "tpm": 100000},
+	"tenant_overrides": {},
+	"max_keys": 10000
+}
+
+# Retries and hedging around provider calls. A call that fails with a
+# retry_statuses status, a connection error or a timeout is retried up to
+# max_retries times with jittered exponential backoff, or after the
+# provider's Retry-After. Streaming calls are only retried while no text has
+# reached the client yet. With hedging on, a non-streaming call still running
+# past the hedge_percentile latency of recent calls to the same model gets a
+# second request in parallel and the first success wins. Retries and hedges
+# spend a per-provider budget that earns retry_budget_ratio per call (plus
+# retry_budget_min_per_second), so an outage does not become a retry storm.
+LlmResilienceConfig = {
+	"max_retries": 2,
+	"retry_statuses": [408, 409, 429, 500, 502, 503, 504],
+	"backoff_initial": 0.5,
+	"backoff_max": 8.0,
+	"max_retry_after": 30.0,
+	"hedging_enabled": os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true",
+	"hedge_percentile": 0.95,
+	"hedge_min_delay": 1.0,
+	"hedge_min_samples": 20,
+	"latency_window": 200,
+	"retry_budget_ratio": 0.1,
+	"retry_budget_min_per_second": 1.0,
+	"retry_budget_max": 20
+}
+
+# /api/v1/mcp/process_batch. Items from all batches share max_concurrency
+# execution slots, and at most per_client[selected_client] (or
+# default_per_client) of them call the same LLM provider at once.
+BatchConfig = {
+	"max_items": 1000,
+	"max_concurrency": int(os.getenv("BATCH_MAX_CONCURRENCY", "16")),
+	"default_per_client": 8,
+	"per_client": {
+		"MCP_CLIENT_AZURE_AI": 8,
+		"MCP_CLIENT_OPENAI": 8,
+		"MCP_CLIENT_GEMINI": 4
+	}
+}
+
+# Local BM25 tool router that runs before the tool-selection LLM call.
+# Catalogs of up to small_catalog_size tools are sent whole to the main call;
+# larger ones are routed locally when the top match is confident enough.
+ToolRouterConfig = {
+	"enabled": True,
+	"small_catalog_size": 8,
+	"min_score": 1.0,
+	"min_confidence": 0.6,
+	"select_ratio": 0.5,
+	"max_selected_tools": 5
+}
+
+# Memoized tool-selection LLM results, keyed by normalized input, selected
+# servers and tool catalog hash
+SelectionCacheConfig = {
+	"enabled": True,
+	"max_entries": 2048,
+	"ttl_seconds": 600
+}
+
+# Opt-in cache for deterministic LLM calls (temperature <= max_temperature).
+# Bypass per request with "X-LLM-Cache: bypass" or "Cache-Control: no-cache".
+LlmResponseCacheConfig = {
+	"enabled": os.getenv("LLM_RESPONSE_CACHE", "false").lower() == "true",
+	"max_temperature": 0.1,
+	"memory_max_entries": 1024,
+	"ttl_seconds": 24 * 60 * 60,
+	"disk_enabled": True,
+	"sqlite_path": os.getenv("LLM_RESPONSE_CACHE_PATH", ".cache/llm_responses.sqlite3")
+}
+
+# chat_history compaction before each LLM call. Token counts use tiktoken
+# when installed and a character estimate otherwise.
+ChatHistoryConfig = {
+	"enabled": True,
+	"max_prompt_tokens": 16000,
+	"keep_recent_messages": 4,
+	"tool_stub_max_chars": 200,
+	"encoding": "cl100k_base"
+}
+
+# Budget for a tool result as it enters chat_history. The full result is still
+# returned in executed_tool_calls. "per_tool" overrides by tool name; a
+# ServersConfig entry may carry its own "tool_result_budget" overrides.
+ToolResultBudgetConfig = {
+	"enabled": True,
+	"max_bytes": 32000,
+	"max_tokens": 8000,
+	"array_head": 20,
+	"array_tail": 5,
+	"max_string_chars": 4000,
+	"per_tool": {
+		"get_container_logs": {"max_tokens": 4000},
+		"query_emails": {"array_head": 10, "array_tail": 2},
+		"execute_sparql": {"array_head": 25, "array_tail": 5}
+	}
+}
+
+# Base64 blobs in tool results (images, audio, binary resources) above this
+# size are kept server-side and replaced by a reference, served from
+# /api/v1/mcp/blobs/<ref> until they expire. The store holds at most
+# max_entries blobs and max_bytes of base64 in total, evicting the least
+# recently used first; a blob over max_bytes on its own is left inline.
+ToolResultBlobConfig = {
+	"inline_max_bytes": 8192,
+	"max_entries": 256,
+	"max_bytes": 64 * 1024 * 1024,
+	"ttl_seconds": 900
+}
+
 ServersConfig = [
 	{
 		"server_name": "MCP-GSUITE",
@@ -12,7 +261,8 @@ ServersConfig = [
 			"../servers/MCP-GSUITE/mcp-gsuite",
 			"run",
 			"mcp-gsuite"
-		]
+		],
+		"pool_size": 2
 	},
     {
 		"server_name": "abstractapi-mcp-server",
@@ -53,7 +303,8 @@ ServersConfig = [
 		"command":"python",
 		"args": [
 			"../servers/mcp-server-with-fargate/src/mcp_fargate_server.py"
-		]
+		],
+		"pool_size": 2
     },
     {
 		"server_name": "MCP-PINECONE-PUBLISHED",
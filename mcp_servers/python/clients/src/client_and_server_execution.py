@@ -1,12 +1,23 @@
 import json
-import logging
+import time
+import asyncio
 from typing import Any, Dict, List, Optional
 
-# Assuming these are your imported modules/classes for MCP clients and Azure LLM calls
-from src.llm.azureopenai import azure_openai_processor  # your async LLM call function
-from src.llm.openai import openai_processor  # your async LLM call function
+# Assuming these are your imported modules/classes for MCP clients and LLM calls
+from src.llm.dispatch import call_llm  # routes to the azure/openai/gemini processors
 from src.server_connection import MCPServers  # MCP clients dict or class with call_tool method
-from src.llm.gemini import gemini_processor 
+from src.tool_router import route_tools
+from src.tool_catalog import build_tool_routing
+from src.selection_cache import make_selection_key, get_cached_selection, cache_selection, SelectionCacheStats
+from src.tool_result_shaping import shape_tool_result
+from src.mcp_result import normalize_call_tool_result
+from src.json_codec import dumps
+from src.deadline import DeadlineExceeded, remaining_time
+from src.metrics import ToolLatency
+from src.tracing import span, get_traceparent
+from src.structured_logging import get_logger
+
+logger = get_logger("execution")
 
 
 class ClientAndServerExecutionResponse:
@@ -20,7 +31,14 @@ class ClientAndServerExecutionResponse:
             "llm_responses_arr": [],
             "messages": [],
             "output_type": "text",
-            "executed_tool_calls": []
+            "executed_tool_calls": [],
+            "llm_cache": {"hits": 0, "misses": 0},
+            "prompt_tokens_per_call": [],
+            "tool_loop_iterations": 0,
+            "llm_queue_wait_seconds": 0.0,
+            "llm_retries": 0,
+            "llm_hedges": 0,
+            "llm_deployments": []
         }
         self.Error: Optional[str] = None
         self.Status: bool = False
@@ -34,7 +52,8 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
         client_details = payload.get("client_details", {})
         selected_client = payload.get("selected_client", "")
         selected_servers = payload.get("selected_servers", [])
-        selected_server = selected_servers[0] if selected_servers else ""
+        selected_server = ", ".join(selected_servers)
+        tool_routes = resolve_tool_routes(payload)
 
         # Prepare chat history
         input_content = client_details.get("input", "")
@@ -69,31 +88,44 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
         client_details["prompt"] = tools_getting_agent_prompt
         client_details["tools"] = []
 
+        with span("tool_router"):
+            routing = route_tools(input_content, json.loads(temp_tools), payload.get("tools_catalog_hash"))
+        result.Data["tool_routing"] = routing
+        local_selection = None
+        selection_key = None
+        if routing["decision"] != "llm":
+            local_selection = {"isFunctionCall": True, "selectedTools": routing["selected_tools"]}
+            selection_cache_status = "skipped"
+        else:
+            selection_key = make_selection_key(input_content, selected_servers, payload.get("tools_catalog_hash"))
+            local_selection = get_cached_selection(selection_key)
+            selection_cache_status = "hit" if local_selection is not None else "miss"
+        result.Data["tool_selection_cache"] = {"status": selection_cache_status, **SelectionCacheStats}
+
         if selected_client == "MCP_CLIENT_AZURE_AI":
 
-            # Initial LLM call
-            initial_llm_response = await azure_openai_processor(client_details)
-            if not initial_llm_response.Status:
-                result.Error = initial_llm_response.Error
-                result.Status = initial_llm_response.Status
-                return result
-            extracted_result = extract_data_from_response(initial_llm_response.Data.get("messages", [{}])[0] if initial_llm_response.Data else "")
+            # Tool selection: the local router decides when it is confident,
+            # otherwise the tool-selection LLM call does
+            extracted_result = local_selection
+            if extracted_result is None:
+                initial_llm_response = await call_llm(selected_client, client_details)
+                if not initial_llm_response.Status:
+                    result.Error = initial_llm_response.Error
+                    result.Status = initial_llm_response.Status
+                    return result
+                extracted_result = extract_data_from_response(initial_llm_response.Data.get("messages", [{}])[0] if initial_llm_response.Data else "")
+                cache_selection(selection_key, extracted_result)
             
-            result.Data["total_llm_calls"] += 1
-            result.Data["total_tokens"] += initial_llm_response.Data.get("total_tokens", 0)
-            result.Data["total_input_tokens"] += initial_llm_response.Data.get("total_input_tokens", 0)
-            result.Data["total_output_tokens"] += initial_llm_response.Data.get("total_output_tokens", 0)
-            result.Data["final_llm_response"] = initial_llm_response.Data.get("final_llm_response")
-            result.Data["llm_responses_arr"].append(initial_llm_response.Data.get("final_llm_response"))
-
-            if streaming_callback and streaming_callback.get("is_stream"):
-                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                    "Data": "Optimized Token LLM call Successfully Completed",
-                    "Error": None,
-                    "Status": True,
-                    "StreamingStatus": "IN-PROGRESS",
-                    "Action": "NOTIFICATION"
-                }))
+                record_llm_response(result, initial_llm_response)
+
+                if streaming_callback and streaming_callback.get("is_stream"):
+                    await streaming_callback["streamCallbacks"].on_data(dumps({
+                        "Data": "Optimized Token LLM call Successfully Completed",
+                        "Error": None,
+                        "Status": True,
+                        "StreamingStatus": "IN-PROGRESS",
+                        "Action": "NOTIFICATION"
+                    }))
             
             if extracted_result["isFunctionCall"]:
                 final_tool_calls = []
@@ -111,18 +143,13 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
 
                 # Loop to handle multiple LLM calls and tool executions
                 while True:
-                    response = await azure_openai_processor(client_details)
+                    response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
                     if not response.Status:
                         result.Error = response.Error
                         result.Status = response.Status
                         return result
 
-                    result.Data["total_llm_calls"] += 1
-                    result.Data["total_tokens"] += response.Data.get("total_tokens", 0)
-                    result.Data["total_input_tokens"] += response.Data.get("total_input_tokens", 0)
-                    result.Data["total_output_tokens"] += response.Data.get("total_output_tokens", 0)
-                    result.Data["final_llm_response"] = response.Data.get("final_llm_response")
-                    result.Data["llm_responses_arr"].append(response.Data.get("final_llm_response"))
+                    record_llm_response(result, response)
 
                     if response.Data.get("output_type") == "text":
                         result.Data["messages"].extend(response.Data.get("messages", []))
@@ -132,7 +159,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
 
                         for message in response.Data.get("messages", []):
                             if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                                await streaming_callback["streamCallbacks"].on_data(dumps({
                                     "Data": message,
                                     "Error": None,
                                     "Status": True,
@@ -142,7 +169,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                         return result
 
                     if streaming_callback and streaming_callback.get("is_stream"):
-                        await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                        await streaming_callback["streamCallbacks"].on_data(dumps({
                             "Data": "Tool Calls Started",
                             "Error": None,
                             "Status": True,
@@ -150,57 +177,16 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                             "Action": "NOTIFICATION"
                         }))
 
-                    for tool in response.Data.get("final_llm_response", {}).get("choices", [{}])[0].get("message", {}).get("tool_calls", []):
-                        
-                        tool_name = tool.get("function", {}).get("name")
-                        args = json.loads(tool.get("function", {}).get("arguments", "{}"))
-
-
-                        if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                "Data": f"{selected_server} MCP server {tool_name} call initiated",
-                                "Error": None,
-                                "Status": True,
-                                "StreamingStatus": "IN-PROGRESS",
-                                "Action": "NOTIFICATION"
-                            }))
-
-                        tool_call_result = await call_and_execute_tool(selected_server, selected_server_credentials, tool_name, args)
-
-                        if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                "Data": f"{selected_server} MCP server {tool_name} call result  : {json.dumps(tool_call_result)}",
-                                "Error": None,
-                                "Status": True,
-                                "StreamingStatus": "IN-PROGRESS",
-                                "Action": "NOTIFICATION"
-                            }))
-
-                        result.Data["executed_tool_calls"].append({
-                            "id": tool.get("id"),
-                            "name": tool_name,
-                            "arguments": args,
-                            "result": tool_call_result,
-                        })
-
-                        tool_call_content_data = f"Executed tool: {tool_name} and the result is: {json.dumps(tool_call_result)}"
-                        client_details["chat_history"].append({
-                            "role": "assistant",
-                            "content": tool_call_content_data,
-                        })
+                    tool_calls = get_openai_tool_calls(response.Data.get("final_llm_response", {}))
+                    await execute_tool_calls(tool_routes, selected_server_credentials, tool_calls, client_details, result, streaming_callback)
 
             else:
                 # No function call, normal response case
                 client_details["prompt"] = f"{temp_prompt}. Available tools: {json.dumps(tool_call_details_arr)}"
                 client_details["tools"] = []
 
-                normal_response = await azure_openai_processor(client_details)
-                result.Data["total_llm_calls"] += 1
-                result.Data["total_tokens"] += normal_response.Data.get("total_tokens", 0)
-                result.Data["total_input_tokens"] += normal_response.Data.get("total_input_tokens", 0)
-                result.Data["total_output_tokens"] += normal_response.Data.get("total_output_tokens", 0)
-                result.Data["final_llm_response"] = normal_response.Data.get("final_llm_response")
-                result.Data["llm_responses_arr"].append(normal_response.Data.get("final_llm_response"))
+                normal_response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
+                record_llm_response(result, normal_response)
 
                 result.Data["output_type"] = normal_response.Data.get("output_type", "")
                 result.Error = normal_response.Error
@@ -211,7 +197,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                     result.Data["messages"] = normal_response.Data.get("messages", [])
                     for message in normal_response.Data.get("messages", []):
                         if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                            await streaming_callback["streamCallbacks"].on_data(dumps({
                                 "Data": message,
                                 "Error": None,
                                 "Status": True,
@@ -234,18 +220,13 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                     client_details["tools"] = final_tool_calls
 
                     while True:
-                        response = await azure_openai_processor(client_details)
+                        response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
                         if not response.Status:
                             result.Error = response.Error
                             result.Status = response.Status
                             return result
 
-                        result.Data["total_llm_calls"] += 1
-                        result.Data["total_tokens"] += response.Data.get("total_tokens", 0)
-                        result.Data["total_input_tokens"] += response.Data.get("total_input_tokens", 0)
-                        result.Data["total_output_tokens"] += response.Data.get("total_output_tokens", 0)
-                        result.Data["final_llm_response"] = response.Data.get("final_llm_response")
-                        result.Data["llm_responses_arr"].append(response.Data.get("final_llm_response"))
+                        record_llm_response(result, response)
 
                         if response.Data.get("output_type") == "text":
                             result.Data["messages"].extend(response.Data.get("messages", []))
@@ -255,7 +236,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
 
                             for message in response.Data.get("messages", []):
                                 if streaming_callback and streaming_callback.get("is_stream"):
-                                    await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                                    await streaming_callback["streamCallbacks"].on_data(dumps({
                                         "Data": message,
                                         "Error": None,
                                         "Status": True,
@@ -265,7 +246,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                             return result
 
                         if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                            await streaming_callback["streamCallbacks"].on_data(dumps({
                                 "Data": "Tool Calls Started",
                                 "Error": None,
                                 "Status": True,
@@ -273,68 +254,33 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                                 "Action": "NOTIFICATION"
                             }))
 
-                        for tool in response.Data.get("final_llm_response", {}).get("choices", [{}])[0].get("message", {}).get("tool_calls", []):
-                            tool_name = tool.get("function", {}).get("name")
-                            args = json.loads(tool.get("function", {}).get("arguments", "{}"))
-
-                            if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                    "Data": f"{selected_server} MCP server {tool_name} call initiated",
-                                    "Error": None,
-                                    "Status": True,
-                                    "StreamingStatus": "IN-PROGRESS",
-                                    "Action": "NOTIFICATION"
-                                }))
-
-                            tool_call_result = await call_and_execute_tool(selected_server, selected_server_credentials, tool_name, args)
-
-                            if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                    "Data": f"{selected_server} MCP server {tool_name} call result  : {json.dumps(tool_call_result)}",
-                                    "Error": None,
-                                    "Status": True,
-                                    "StreamingStatus": "IN-PROGRESS",
-                                    "Action": "NOTIFICATION"
-                                }))
-
-                            result.Data["executed_tool_calls"].append({
-                                "id": tool.get("id"),
-                                "name": tool_name,
-                                "arguments": args,
-                                "result": tool_call_result,
-                            })
-
-                            tool_call_content_data = f"Executed tool: {tool_name} and the result is: {json.dumps(tool_call_result)}"
-                            client_details["chat_history"].append({
-                                "role": "assistant",
-                                "content": tool_call_content_data,
-                            })
+                        tool_calls = get_openai_tool_calls(response.Data.get("final_llm_response", {}))
+                        await execute_tool_calls(tool_routes, selected_server_credentials, tool_calls, client_details, result, streaming_callback)
         
         elif selected_client == "MCP_CLIENT_OPENAI":
 
-            # Initial LLM call
-            initial_llm_response = await openai_processor(client_details)
-            if not initial_llm_response.Status:
-                result.Error = initial_llm_response.Error
-                result.Status = initial_llm_response.Status
-                return result
-            extracted_result = extract_data_from_response(initial_llm_response.Data.get("messages", [{}])[0] if initial_llm_response.Data else "")
+            # Tool selection: the local router decides when it is confident,
+            # otherwise the tool-selection LLM call does
+            extracted_result = local_selection
+            if extracted_result is None:
+                initial_llm_response = await call_llm(selected_client, client_details)
+                if not initial_llm_response.Status:
+                    result.Error = initial_llm_response.Error
+                    result.Status = initial_llm_response.Status
+                    return result
+                extracted_result = extract_data_from_response(initial_llm_response.Data.get("messages", [{}])[0] if initial_llm_response.Data else "")
+                cache_selection(selection_key, extracted_result)
             
-            result.Data["total_llm_calls"] += 1
-            result.Data["total_tokens"] += initial_llm_response.Data.get("total_tokens", 0)
-            result.Data["total_input_tokens"] += initial_llm_response.Data.get("total_input_tokens", 0)
-            result.Data["total_output_tokens"] += initial_llm_response.Data.get("total_output_tokens", 0)
-            result.Data["final_llm_response"] = initial_llm_response.Data.get("final_llm_response")
-            result.Data["llm_responses_arr"].append(initial_llm_response.Data.get("final_llm_response"))
-
-            if streaming_callback and streaming_callback.get("is_stream"):
-                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                    "Data": "Optimized Token LLM call Successfully Completed",
-                    "Error": None,
-                    "Status": True,
-                    "StreamingStatus": "IN-PROGRESS",
-                    "Action": "NOTIFICATION"
-                }))
+                record_llm_response(result, initial_llm_response)
+
+                if streaming_callback and streaming_callback.get("is_stream"):
+                    await streaming_callback["streamCallbacks"].on_data(dumps({
+                        "Data": "Optimized Token LLM call Successfully Completed",
+                        "Error": None,
+                        "Status": True,
+                        "StreamingStatus": "IN-PROGRESS",
+                        "Action": "NOTIFICATION"
+                    }))
             
             if extracted_result["isFunctionCall"]:
                 final_tool_calls = []
@@ -352,18 +298,13 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
 
                 # Loop to handle multiple LLM calls and tool executions
                 while True:
-                    response = await openai_processor(client_details)
+                    response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
                     if not response.Status:
                         result.Error = response.Error
                         result.Status = response.Status
                         return result
 
-                    result.Data["total_llm_calls"] += 1
-                    result.Data["total_tokens"] += response.Data.get("total_tokens", 0)
-                    result.Data["total_input_tokens"] += response.Data.get("total_input_tokens", 0)
-                    result.Data["total_output_tokens"] += response.Data.get("total_output_tokens", 0)
-                    result.Data["final_llm_response"] = response.Data.get("final_llm_response")
-                    result.Data["llm_responses_arr"].append(response.Data.get("final_llm_response"))
+                    record_llm_response(result, response)
 
                     if response.Data.get("output_type") == "text":
                         result.Data["messages"].extend(response.Data.get("messages", []))
@@ -373,7 +314,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
 
                         for message in response.Data.get("messages", []):
                             if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                                await streaming_callback["streamCallbacks"].on_data(dumps({
                                     "Data": message,
                                     "Error": None,
                                     "Status": True,
@@ -383,7 +324,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                         return result
 
                     if streaming_callback and streaming_callback.get("is_stream"):
-                        await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                        await streaming_callback["streamCallbacks"].on_data(dumps({
                             "Data": "Tool Calls Started",
                             "Error": None,
                             "Status": True,
@@ -391,57 +332,16 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                             "Action": "NOTIFICATION"
                         }))
 
-                    for tool in response.Data.get("final_llm_response", {}).get("choices", [{}])[0].get("message", {}).get("tool_calls", []):
-                        
-                        tool_name = tool.get("function", {}).get("name")
-                        args = json.loads(tool.get("function", {}).get("arguments", "{}"))
-
-
-                        if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                "Data": f"{selected_server} MCP server {tool_name} call initiated",
-                                "Error": None,
-                                "Status": True,
-                                "StreamingStatus": "IN-PROGRESS",
-                                "Action": "NOTIFICATION"
-                            }))
-
-                        tool_call_result = await call_and_execute_tool(selected_server, selected_server_credentials, tool_name, args)
-
-                        if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                "Data": f"{selected_server} MCP server {tool_name} call result  : {json.dumps(tool_call_result)}",
-                                "Error": None,
-                                "Status": True,
-                                "StreamingStatus": "IN-PROGRESS",
-                                "Action": "NOTIFICATION"
-                            }))
-
-                        result.Data["executed_tool_calls"].append({
-                            "id": tool.get("id"),
-                            "name": tool_name,
-                            "arguments": args,
-                            "result": tool_call_result,
-                        })
-
-                        tool_call_content_data = f"Executed tool: {tool_name} and the result is: {json.dumps(tool_call_result)}"
-                        client_details["chat_history"].append({
-                            "role": "assistant",
-                            "content": tool_call_content_data,
-                        })
+                    tool_calls = get_openai_tool_calls(response.Data.get("final_llm_response", {}))
+                    await execute_tool_calls(tool_routes, selected_server_credentials, tool_calls, client_details, result, streaming_callback)
 
             else:
                 # No function call, normal response case
                 client_details["prompt"] = f"{temp_prompt}. Available tools: {json.dumps(tool_call_details_arr)}"
                 client_details["tools"] = []
 
-                normal_response = await openai_processor(client_details)
-                result.Data["total_llm_calls"] += 1
-                result.Data["total_tokens"] += normal_response.Data.get("total_tokens", 0)
-                result.Data["total_input_tokens"] += normal_response.Data.get("total_input_tokens", 0)
-                result.Data["total_output_tokens"] += normal_response.Data.get("total_output_tokens", 0)
-                result.Data["final_llm_response"] = normal_response.Data.get("final_llm_response")
-                result.Data["llm_responses_arr"].append(normal_response.Data.get("final_llm_response"))
+                normal_response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
+                record_llm_response(result, normal_response)
 
                 result.Data["output_type"] = normal_response.Data.get("output_type", "")
                 result.Error = normal_response.Error
@@ -452,7 +352,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                     result.Data["messages"] = normal_response.Data.get("messages", [])
                     for message in normal_response.Data.get("messages", []):
                         if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                            await streaming_callback["streamCallbacks"].on_data(dumps({
                                 "Data": message,
                                 "Error": None,
                                 "Status": True,
@@ -475,18 +375,13 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                     client_details["tools"] = final_tool_calls
 
                     while True:
-                        response = await openai_processor(client_details)
+                        response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
                         if not response.Status:
                             result.Error = response.Error
                             result.Status = response.Status
                             return result
 
-                        result.Data["total_llm_calls"] += 1
-                        result.Data["total_tokens"] += response.Data.get("total_tokens", 0)
-                        result.Data["total_input_tokens"] += response.Data.get("total_input_tokens", 0)
-                        result.Data["total_output_tokens"] += response.Data.get("total_output_tokens", 0)
-                        result.Data["final_llm_response"] = response.Data.get("final_llm_response")
-                        result.Data["llm_responses_arr"].append(response.Data.get("final_llm_response"))
+                        record_llm_response(result, response)
 
                         if response.Data.get("output_type") == "text":
                             result.Data["messages"].extend(response.Data.get("messages", []))
@@ -496,7 +391,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
 
                             for message in response.Data.get("messages", []):
                                 if streaming_callback and streaming_callback.get("is_stream"):
-                                    await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                                    await streaming_callback["streamCallbacks"].on_data(dumps({
                                         "Data": message,
                                         "Error": None,
                                         "Status": True,
@@ -506,7 +401,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                             return result
 
                         if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                            await streaming_callback["streamCallbacks"].on_data(dumps({
                                 "Data": "Tool Calls Started",
                                 "Error": None,
                                 "Status": True,
@@ -514,69 +409,33 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                                 "Action": "NOTIFICATION"
                             }))
 
-                        for tool in response.Data.get("final_llm_response", {}).get("choices", [{}])[0].get("message", {}).get("tool_calls", []):
-                            tool_name = tool.get("function", {}).get("name")
-                            args = json.loads(tool.get("function", {}).get("arguments", "{}"))
-
-                            if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                    "Data": f"{selected_server} MCP server {tool_name} call initiated",
-                                    "Error": None,
-                                    "Status": True,
-                                    "StreamingStatus": "IN-PROGRESS",
-                                    "Action": "NOTIFICATION"
-                                }))
-
-                            tool_call_result = await call_and_execute_tool(selected_server, selected_server_credentials, tool_name, args)
-
-                            if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                    "Data": f"{selected_server} MCP server {tool_name} call result  : {json.dumps(tool_call_result)}",
-                                    "Error": None,
-                                    "Status": True,
-                                    "StreamingStatus": "IN-PROGRESS",
-                                    "Action": "NOTIFICATION"
-                                }))
-
-                            result.Data["executed_tool_calls"].append({
-                                "id": tool.get("id"),
-                                "name": tool_name,
-                                "arguments": args,
-                                "result": tool_call_result,
-                            })
-
-                            tool_call_content_data = f"Executed tool: {tool_name} and the result is: {json.dumps(tool_call_result)}"
-                            client_details["chat_history"].append({
-                                "role": "assistant",
-                                "content": tool_call_content_data,
-                            })
+                        tool_calls = get_openai_tool_calls(response.Data.get("final_llm_response", {}))
+                        await execute_tool_calls(tool_routes, selected_server_credentials, tool_calls, client_details, result, streaming_callback)
         
         elif selected_client == "MCP_CLIENT_GEMINI":
 
-            # Initial LLM call
-            initial_llm_response = await gemini_processor(client_details)
-            print("Initial LLM response:", initial_llm_response)
-            if not initial_llm_response.Status:
-                result.Error = initial_llm_response.Error
-                result.Status = initial_llm_response.Status
-                return result
-            extracted_result = extract_data_from_response(initial_llm_response.Data.get("messages", [{}])[0] if initial_llm_response.Data else "")
+            # Tool selection: the local router decides when it is confident,
+            # otherwise the tool-selection LLM call does
+            extracted_result = local_selection
+            if extracted_result is None:
+                initial_llm_response = await call_llm(selected_client, client_details)
+                if not initial_llm_response.Status:
+                    result.Error = initial_llm_response.Error
+                    result.Status = initial_llm_response.Status
+                    return result
+                extracted_result = extract_data_from_response(initial_llm_response.Data.get("messages", [{}])[0] if initial_llm_response.Data else "")
+                cache_selection(selection_key, extracted_result)
             
-            result.Data["total_llm_calls"] += 1
-            result.Data["total_tokens"] += initial_llm_response.Data.get("total_tokens", 0)
-            result.Data["total_input_tokens"] += initial_llm_response.Data.get("total_input_tokens", 0)
-            result.Data["total_output_tokens"] += initial_llm_response.Data.get("total_output_tokens", 0)
-            result.Data["final_llm_response"] = initial_llm_response.Data.get("final_llm_response")
-            result.Data["llm_responses_arr"].append(initial_llm_response.Data.get("final_llm_response"))
-
-            if streaming_callback and streaming_callback.get("is_stream"):
-                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                    "Data": "Optimized Token LLM call Successfully Completed",
-                    "Error": None,
-                    "Status": True,
-                    "StreamingStatus": "IN-PROGRESS",
-                    "Action": "NOTIFICATION"
-                }))
+                record_llm_response(result, initial_llm_response)
+
+                if streaming_callback and streaming_callback.get("is_stream"):
+                    await streaming_callback["streamCallbacks"].on_data(dumps({
+                        "Data": "Optimized Token LLM call Successfully Completed",
+                        "Error": None,
+                        "Status": True,
+                        "StreamingStatus": "IN-PROGRESS",
+                        "Action": "NOTIFICATION"
+                    }))
             
             if extracted_result["isFunctionCall"]:
                 final_tool_calls = []
@@ -603,19 +462,13 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                     if count != 1:
                          client_details["tools"] = []
                     
-                    response = await gemini_processor(client_details)
-                    print(response)
+                    response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
                     if not response.Status:
                         result.Error = response.Error
                         result.Status = response.Status
                         return result
 
-                    result.Data["total_llm_calls"] += 1
-                    result.Data["total_tokens"] += response.Data.get("total_tokens", 0)
-                    result.Data["total_input_tokens"] += response.Data.get("total_input_tokens", 0)
-                    result.Data["total_output_tokens"] += response.Data.get("total_output_tokens", 0)
-                    result.Data["final_llm_response"] = response.Data.get("final_llm_response")
-                    result.Data["llm_responses_arr"].append(response.Data.get("final_llm_response"))
+                    record_llm_response(result, response)
 
                     if response.Data.get("output_type") == "text":
                         result.Data["messages"].extend(response.Data.get("messages", []))
@@ -625,7 +478,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
 
                         for message in response.Data.get("messages", []):
                             if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                                await streaming_callback["streamCallbacks"].on_data(dumps({
                                     "Data": message,
                                     "Error": None,
                                     "Status": True,
@@ -635,7 +488,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                         return result
 
                     if streaming_callback and streaming_callback.get("is_stream"):
-                        await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                        await streaming_callback["streamCallbacks"].on_data(dumps({
                             "Data": "Tool Calls Started",
                             "Error": None,
                             "Status": True,
@@ -649,52 +502,8 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                     content = first_candidate.get("content", {}) if isinstance(first_candidate, dict) else {}
                     parts = content.get("parts", []) if isinstance(content, dict) else []
 
-                    for tool in parts:
-
-                        tool_name = tool.get("functionCall", {}).get("name")
-                        args_raw = tool.get("functionCall", {}).get("args", {})
-
-                        if isinstance(args_raw, str):
-                            try:
-                                 args = json.loads(args_raw)
-                            except json.JSONDecodeError as e:
-                                 args = {}
-                        else:
-                            args = args_raw
-
-                        if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                "Data": f"{selected_server} MCP server {tool_name} call initiated",
-                                "Error": None,
-                                "Status": True,
-                                "StreamingStatus": "IN-PROGRESS",
-                                "Action": "NOTIFICATION"
-                            }))
-
-                        tool_call_result = await call_and_execute_tool(selected_server, selected_server_credentials, tool_name, args)
-
-                        if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                "Data": f"{selected_server} MCP server {tool_name} call result  : {json.dumps(tool_call_result)}",
-                                "Error": None,
-                                "Status": True,
-                                "StreamingStatus": "IN-PROGRESS",
-                                "Action": "NOTIFICATION"
-                            }))
-
-
-                        result.Data["executed_tool_calls"].append({
-                            "id": tool.get("id"),
-                            "name": tool_name,
-                            "arguments": args,
-                            "result": tool_call_result,
-                        })
-
-                        tool_call_content_data = f"Executed tool: {tool_name} and the result is: {json.dumps(tool_call_result)}"
-                        client_details["chat_history"].append({
-                            "role": "model",
-                            "content": tool_call_content_data,
-                        })
+                    tool_calls = get_gemini_tool_calls(parts)
+                    await execute_tool_calls(tool_routes, selected_server_credentials, tool_calls, client_details, result, streaming_callback, history_role="model")
 
                     count+=1
             else:
@@ -702,13 +511,8 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                 client_details["prompt"] = f"{temp_prompt}. Available tools: {json.dumps(tool_call_details_arr)}"
                 client_details["tools"] = []
 
-                normal_response = await gemini_processor(client_details)
-                result.Data["total_llm_calls"] += 1
-                result.Data["total_tokens"] += normal_response.Data.get("total_tokens", 0)
-                result.Data["total_input_tokens"] += normal_response.Data.get("total_input_tokens", 0)
-                result.Data["total_output_tokens"] += normal_response.Data.get("total_output_tokens", 0)
-                result.Data["final_llm_response"] = normal_response.Data.get("final_llm_response")
-                result.Data["llm_responses_arr"].append(normal_response.Data.get("final_llm_response"))
+                normal_response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
+                record_llm_response(result, normal_response)
 
                 result.Data["output_type"] = normal_response.Data.get("output_type", "")
                 result.Error = normal_response.Error
@@ -726,7 +530,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                     result.Data["messages"] = normal_response.Data.get("messages", [])
                     for message in normal_response.Data.get("messages", []):
                         if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                            await streaming_callback["streamCallbacks"].on_data(dumps({
                                 "Data": message,
                                 "Error": None,
                                 "Status": True,
@@ -758,18 +562,13 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                         if count != 1:
                             client_details["tools"] = []
 
-                        response = await gemini_processor(client_details)
+                        response = await call_llm(selected_client, client_details, get_stream_callbacks(streaming_callback))
                         if not response.Status:
                             result.Error = response.Error
                             result.Status = response.Status
                             return result
 
-                        result.Data["total_llm_calls"] += 1
-                        result.Data["total_tokens"] += response.Data.get("total_tokens", 0)
-                        result.Data["total_input_tokens"] += response.Data.get("total_input_tokens", 0)
-                        result.Data["total_output_tokens"] += response.Data.get("total_output_tokens", 0)
-                        result.Data["final_llm_response"] = response.Data.get("final_llm_response")
-                        result.Data["llm_responses_arr"].append(response.Data.get("final_llm_response"))
+                        record_llm_response(result, response)
 
                         if response.Data.get("output_type") == "text":
                             result.Data["messages"].extend(response.Data.get("messages", []))
@@ -779,7 +578,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
 
                             for message in response.Data.get("messages", []):
                                 if streaming_callback and streaming_callback.get("is_stream"):
-                                    await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                                    await streaming_callback["streamCallbacks"].on_data(dumps({
                                         "Data": message,
                                         "Error": None,
                                         "Status": True,
@@ -789,7 +588,7 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                             return result
 
                         if streaming_callback and streaming_callback.get("is_stream"):
-                            await streaming_callback["streamCallbacks"].on_data(json.dumps({
+                            await streaming_callback["streamCallbacks"].on_data(dumps({
                                 "Data": "Tool Calls Started",
                                 "Error": None,
                                 "Status": True,
@@ -803,60 +602,22 @@ async def client_and_server_execution(payload: Dict[str, Any], streaming_callbac
                         content = first_candidate.get("content", {}) if isinstance(first_candidate, dict) else {}
                         parts = content.get("parts", []) if isinstance(content, dict) else []
 
-                        for tool in parts:
-
-                            tool_name = tool.get("functionCall", {}).get("name")
-                            args_raw = tool.get("functionCall", {}).get("args", {})
-
-                            if isinstance(args_raw, str):
-                                try:
-                                    args = json.loads(args_raw)
-                                except json.JSONDecodeError as e:
-                                    args = {}
-                            else:
-                                args = args_raw
-
-                            if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                    "Data": f"{selected_server} MCP server {tool_name} call initiated",
-                                    "Error": None,
-                                    "Status": True,
-                                    "StreamingStatus": "IN-PROGRESS",
-                                    "Action": "NOTIFICATION"
-                                }))
-
-                            tool_call_result = await call_and_execute_tool(selected_server, selected_server_credentials, tool_name, args)
-
-                            if streaming_callback and streaming_callback.get("is_stream"):
-                                await streaming_callback["streamCallbacks"].on_data(json.dumps({
-                                    "Data": f"{selected_server} MCP server {tool_name} call result  : {json.dumps(tool_call_result)}",
-                                    "Error": None,
-                                    "Status": True,
-                                    "StreamingStatus": "IN-PROGRESS",
-                                    "Action": "NOTIFICATION"
-                                }))
-
-
-                            result.Data["executed_tool_calls"].append({
-                                "id": tool.get("id"),
-                                "name": tool_name,
-                                "arguments": args,
-                                "result": tool_call_result,
-                            })
-
-                            tool_call_content_data = f"Executed tool: {tool_name} and the result is: {json.dumps(tool_call_result)}"
-                            client_details["chat_history"].append({
-                                "role": "model",
-                                "content": tool_call_content_data,
-                            })
+                        tool_calls = get_gemini_tool_calls(parts)
+                        await execute_tool_calls(tool_routes, selected_server_credentials, tool_calls, client_details, result, streaming_callback, history_role="model")
 
                         count+=1    
 
         result.Status = True
         return result
 
+    except DeadlineExceeded as e:
+        # Keep what was done before the deadline: executed tools, token counts
+        result.Error = str(e)
+        result.Status = False
+        return result
+
     except Exception as e:
-        logging.error(f"Exception in client_and_server_execution: {e}")
+        logger.exception("Exception in client_and_server_execution: %s", e)
         res = ClientAndServerExecutionResponse()
         res.Error = str(e)
         res.Status = False
@@ -890,16 +651,172 @@ def extract_data_from_response(message: Any) -> Dict[str, Any]:
     }
 
 
+def record_llm_response(result: ClientAndServerExecutionResponse, response: Any):
+    """Add one LLM call's usage to the request totals."""
+    result.Data["total_llm_calls"] += response.Data.get("total_llm_calls", 1)
+    result.Data["total_tokens"] += response.Data.get("total_tokens", 0)
+    result.Data["total_input_tokens"] += response.Data.get("total_input_tokens", 0)
+    result.Data["total_output_tokens"] += response.Data.get("total_output_tokens", 0)
+    result.Data["final_llm_response"] = response.Data.get("final_llm_response")
+    result.Data["llm_responses_arr"].append(response.Data.get("final_llm_response"))
+
+    result.Data["prompt_tokens_per_call"].append(response.Data.get("estimated_prompt_tokens"))
+    result.Data["llm_queue_wait_seconds"] = round(result.Data["llm_queue_wait_seconds"] + response.Data.get("llm_queue_wait_seconds", 0), 3)
+    result.Data["llm_retries"] += response.Data.get("llm_retries", 0)
+    result.Data["llm_hedges"] += int(bool(response.Data.get("llm_hedged")))
+    if response.Data.get("deployment"):
+        result.Data["llm_deployments"].append(response.Data["deployment"])
+
+    cache_status = response.Data.get("llm_cache")
+    if cache_status == "hit":
+        result.Data["llm_cache"]["hits"] += 1
+    elif cache_status == "miss":
+        result.Data["llm_cache"]["misses"] += 1
+
+
+def get_stream_callbacks(streaming_callback: Optional[Any]) -> Optional[Any]:
+    """Stream handler for user-facing LLM calls; the tool-selection call is never streamed."""
+    if streaming_callback and streaming_callback.get("is_stream"):
+        return streaming_callback["streamCallbacks"]
+    return None
+
+
+def get_openai_tool_calls(final_llm_response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Normalize OpenAI/Azure tool calls to {"id", "name", "arguments"}."""
+    tool_calls = []
+    for tool in final_llm_response.get("choices", [{}])[0].get("message", {}).get("tool_calls", []) or []:
+        tool_calls.append({
+            "id": tool.get("id"),
+            "name": tool.get("function", {}).get("name"),
+            "arguments": json.loads(tool.get("function", {}).get("arguments", "{}")),
+        })
+    return tool_calls
+
+
+def get_gemini_tool_calls(parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalize Gemini functionCall parts to {"id", "name", "arguments"}."""
+    tool_calls = []
+    for part in parts:
+        args_raw = part.get("functionCall", {}).get("args", {})
+        if isinstance(args_raw, str):
+            try:
+                args = json.loads(args_raw)
+            except json.JSONDecodeError:
+                args = {}
+        else:
+            args = args_raw
+
+        tool_calls.append({
+            "id": part.get("id"),
+            "name": part.get("functionCall", {}).get("name"),
+            "arguments": args,
+        })
+    return tool_calls
+
+
+def resolve_tool_routes(payload: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """Exposed tool name -> {"server", "tool"}; built here if validation did not provide it"""
+    if payload.get("tool_routes") is not None:
+        return payload["tool_routes"]
+    return build_tool_routing(payload.get("selected_servers", []))[1]
+
+
+async def execute_tool_calls(
+    tool_routes: Dict[str, Dict[str, str]],
+    credentials: Any,
+    tool_calls: List[Dict[str, Any]],
+    client_details: Dict[str, Any],
+    result: ClientAndServerExecutionResponse,
+    streaming_callback: Optional[Any] = None,
+    history_role: str = "assistant"
+):
+    """Run the tool calls of one LLM turn concurrently.
+
+    Each call goes to the server that owns the tool according to tool_routes,
+    so calls to different servers run side by side. Stream notifications are sent per call as each one starts and finishes;
+    executed_tool_calls and chat_history are appended in the original order.
+    chat_history gets the result shaped to its budget, executed_tool_calls
+    the full result. A call that raises gets an error message as its result,
+    like a call that times out, and the other calls still complete.
+    """
+    is_stream = streaming_callback and streaming_callback.get("is_stream")
+    result.Data["tool_loop_iterations"] += 1
+
+    async def run_one(tool_call: Dict[str, Any]) -> Any:
+        route = tool_routes.get(tool_call["name"])
+        if route is None:
+            return f"Tool {tool_call['name']} is not available on the selected servers"
+        selected_server, tool_name = route["server"], route["tool"]
+        if is_stream:
+            await streaming_callback["streamCallbacks"].on_data(dumps({
+                "Data": f"{selected_server} MCP server {tool_name} call initiated",
+                "Error": None,
+                "Status": True,
+                "StreamingStatus": "IN-PROGRESS",
+                "Action": "NOTIFICATION"
+            }))
+
+        # The server's session pool caps concurrent calls and picks the least-busy session
+        timeout = remaining_time(client_details)
+        if timeout is not None and timeout <= 0:
+            tool_call_result = f"Tool {tool_name} skipped: request deadline exceeded"
+        else:
+            started_at = time.perf_counter()
+            with span("tool.call", server=selected_server, tool=tool_name):
+                tool_call_result = await call_and_execute_tool(selected_server, credentials, tool_name, tool_call["arguments"], timeout)
+            ToolLatency.observe(time.perf_counter() - started_at, selected_server, tool_name)
+
+        if is_stream:
+            await streaming_callback["streamCallbacks"].on_data(dumps({
+                "Data": f"{selected_server} MCP server {tool_name} call result  : {dumps(tool_call_result)}",
+                "Error": None,
+                "Status": True,
+                "StreamingStatus": "IN-PROGRESS",
+                "Action": "NOTIFICATION"
+            }))
+        return tool_call_result
+
+    # One failing call must not fail the turn or leave its siblings running unowned
+    tool_call_results = await asyncio.gather(*(run_one(tool_call) for tool_call in tool_calls), return_exceptions=True)
+
+    for tool_call, tool_call_result in zip(tool_calls, tool_call_results):
+        if isinstance(tool_call_result, BaseException):
+            if not isinstance(tool_call_result, Exception):
+                raise tool_call_result
+            logger.warning("Tool call %s failed: %s", tool_call["name"], tool_call_result)
+            tool_call_result = f"Tool {tool_call['name']} failed: {str(tool_call_result) or type(tool_call_result).__name__}"
+        route = tool_routes.get(tool_call["name"], {"server": None, "tool": tool_call["name"]})
+        with span("tool.shape_result", tool=route["tool"]):
+            context_result, shaping = shape_tool_result(route["server"], route["tool"], tool_call_result)
+        result.Data["executed_tool_calls"].append({
+            "id": tool_call["id"],
+            "name": tool_call["name"],
+            "server": route["server"],
+            "arguments": tool_call["arguments"],
+            "result": tool_call_result,
+            "result_shaping": shaping,
+        })
+
+        tool_call_content_data = f"Executed tool: {tool_call['name']} and the result is: {context_result}"
+        client_details["chat_history"].append({
+            "role": history_role,
+            "content": tool_call_content_data,
+        })
+
+
 async def call_and_execute_tool(
     selected_server: str,
     credentials: Any,
     tool_name: str,
-    args: Dict[str, Any]
+    args: Dict[str, Any],
+    timeout: Optional[float] = None
 ) -> Any:
     """Call the MCP client tool with args and credentials, with JS-style try/catch
-       and JSON-serializable output fallback."""
+       and JSON-serializable output fallback. `timeout` is the time left before
+       the request deadline."""
     if selected_server not in MCPServers:
-        raise ValueError(f"Server {selected_server} not found in MCPServers")
+        # No live session, e.g. while the supervisor restarts the server; reported like a failed call
+        return f"Tool {tool_name} failed: server {selected_server} is not connected"
     
     # pull per-server creds, defaulting to {}
     creds = credentials.get(selected_server, {})
@@ -938,19 +855,20 @@ async def call_and_execute_tool(
     try:
         
         # perform the tool call
-        raw_result = await client.call_tool(tool_name, args)
+        # The trace context lets the server join its own spans to this request
+        traceparent = get_traceparent()
+        raw_result = await client.call_tool(tool_name, args, timeout=timeout, meta={"traceparent": traceparent} if traceparent else None)
         
-        # try to JSON-serialize it
+        # build the JSON-ready wire form
         try:
-            # this will recurse into __dict__ for any object
-            serialized = json.loads(
-                json.dumps(raw_result, default=lambda o: getattr(o, "__dict__", str(o)))
-            )
-            tool_call_result = serialized
-        except (TypeError, ValueError):
+            tool_call_result = normalize_call_tool_result(raw_result)
+        except (AttributeError, TypeError, ValueError):
             # fallback to string
             tool_call_result = str(raw_result)
 
+    except asyncio.TimeoutError:
+        tool_call_result = f"Tool {tool_name} timed out: request deadline exceeded"
+
     except Exception as err:
         # catch any call-tool exception and stringify it
         tool_call_result = str(err)
@@ -1,7 +1,11 @@
 from typing import Dict, Any, Callable, Optional
 
 from src.server_connection import MCPServers
+from src.tool_catalog import build_tool_routing, get_catalog_hash
 from src.client_and_server_config import ServersConfig, ClientsConfig
+from src.structured_logging import get_logger
+
+logger = get_logger("validation")
 
 
 async def client_and_server_validation(payload: Dict[str, Any], streaming_callback: Optional[Callable] = None):
@@ -12,7 +16,7 @@ async def client_and_server_validation(payload: Dict[str, Any], streaming_callba
         selected_servers = payload.get("selected_servers", [])
 
         if not selected_client or not selected_servers or not selected_server_credentials or not client_details:
-            print("Invalid Request Payload")
+            logger.info("Invalid Request Payload")
             return {
                 "payload": None,
                 "error": "Invalid Request Payload",
@@ -21,7 +25,7 @@ async def client_and_server_validation(payload: Dict[str, Any], streaming_callba
 
         for server in selected_servers:
             if server not in MCPServers:
-                print("Invalid Server")
+                logger.info("Invalid Server", extra={"server": server})
                 return {
                     "payload": None,
                     "error": "Invalid Server",
@@ -29,34 +33,18 @@ async def client_and_server_validation(payload: Dict[str, Any], streaming_callba
                 }
 
         if selected_client not in ClientsConfig:
-            print("Invalid Client")
+            logger.info("Invalid Client", extra={"client": selected_client})
             return {
                 "payload": None,
                 "error": "Invalid Client",
                 "status": False
             }
 
-        tools_arr = []
-        for server in selected_servers:
-   
-            resource = await MCPServers[server].list_tools()
-            if resource:
-                for tool in resource.tools:
-                    tool_dict = {
-                        "type": "function",
-                        "function": {
-                            "name": tool.name,
-                            "description": getattr(tool, "description", f"Tool for {tool.name}"),
-                            "parameters": getattr(tool, "inputSchema", {
-                                "type": "object",
-                                "properties": {},
-                                "required": []
-                            })
-                        }
-                    }
-                    tools_arr.append(tool_dict)
+        # Prebuilt schemas from the gateway catalog, refreshed on tools/list_changed;
+        # tool_routes sends each tool call to the server that owns the tool
+        tools_arr, tool_routes = build_tool_routing(selected_servers)
 
-        client_details["tools"] = tools_arr
+        client_details["tools"] = list(tools_arr)
 
 
         return {
@@ -64,14 +52,16 @@ async def client_and_server_validation(payload: Dict[str, Any], streaming_callba
                 "selected_client": selected_client,
                 "selected_servers": selected_servers,
                 "selected_server_credentials": selected_server_credentials,
-                "client_details": client_details
+                "client_details": client_details,
+                "tools_catalog_hash": get_catalog_hash(selected_servers),
+                "tool_routes": tool_routes
             },
             "error": None,
             "status": True
         }
 
     except Exception as err:
-        print("Error initializing MCP ==========>>>>", err)
+        logger.exception("Error validating request: %s", err)
         return {
             "payload": None,
             "error": str(err),
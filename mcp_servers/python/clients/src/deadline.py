@@ -0,0 +1,38 @@
+import time
+from typing import Dict, Any, Optional
+
+from src.client_and_server_config import RequestDeadlineConfig
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before the next LLM or tool call could start"""
+
+
+def set_request_deadline(client_details: Dict[str, Any], timeout: Optional[Any] = None):
+    """Stamp client_details with an absolute deadline ("deadline", time.monotonic() based).
+
+    timeout is in seconds, from the X-Request-Timeout header or the payload's
+    client_details.request_timeout; it is clamped to RequestDeadlineConfig.
+    """
+    if timeout is None:
+        timeout = client_details.get("request_timeout", RequestDeadlineConfig["default_timeout"])
+    try:
+        timeout = float(timeout)
+    except (TypeError, ValueError):
+        timeout = RequestDeadlineConfig["default_timeout"]
+    timeout = min(max(timeout, 1.0), RequestDeadlineConfig["max_timeout"])
+    client_details["deadline"] = time.monotonic() + timeout
+
+
+def remaining_time(client_details: Dict[str, Any]) -> Optional[float]:
+    """Seconds left before the request deadline, or None when there is no deadline"""
+    deadline = client_details.get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(client_details: Dict[str, Any]):
+    remaining = remaining_time(client_details)
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
@@ -0,0 +1,41 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # falls back to the standard library encoder
+    orjson = None
+
+
+# One encoder for the gateway's request, tool-result and SSE paths. orjson is
+# used when installed; both paths emit compact, non-ASCII-escaped JSON.
+def _default(value: Any) -> Any:
+    model_dump = getattr(value, "model_dump", None)
+    if model_dump is not None:
+        return model_dump(exclude_none=True)
+    return str(value)
+
+
+def _std_dumps(value: Any) -> str:
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+if orjson is not None:
+    def dumps_bytes(value: Any) -> bytes:
+        try:
+            return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson rejects e.g. integers wider than 64 bits
+            return _std_dumps(value).encode("utf-8")
+
+    def dumps(value: Any) -> str:
+        return dumps_bytes(value).decode("utf-8")
+
+    loads = orjson.loads
+else:
+    dumps = _std_dumps
+
+    def dumps_bytes(value: Any) -> bytes:
+        return dumps(value).encode("utf-8")
+
+    loads = json.loads
@@ -0,0 +1,186 @@
+import time
+import asyncio
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+
+import aiohttp
+
+from src.client_and_server_config import AzureDeploymentPoolConfig
+from src.llm.http_client import LlmHttpError, get_last_failure
+from src.deadline import DeadlineExceeded
+from src.metrics import Counter, register_collector, render_samples
+from src.structured_logging import get_logger
+
+logger = get_logger("llm")
+
+
+# Weighted least-outstanding-requests balancing over Azure OpenAI
+# deployments. Member state (calls in flight, health, ejection) lives here
+# for the life of the process, so it is shared by every request that goes
+# through the configured pool.
+
+AzureDeploymentCalls = Counter(
+    "gateway_azure_deployment_calls_total", "Azure OpenAI calls per pool member", ("deployment", "outcome")
+)
+
+
+class DeploymentMember:
+    def __init__(self, name: str, budget_id: str):
+        self.name = name
+        # Rate limit key budget of this member (see rate_limiter.acquire_member_budget)
+        self.budget_id = budget_id
+        self.endpoint = ""
+        self.deployment_id = ""
+        self.api_key = ""
+        self.api_version = ""
+        self.weight = 1.0
+        self.in_flight = 0
+        self.health = 1.0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    def update(self, config: Dict[str, Any]):
+        self.endpoint = config.get("endpoint", "")
+        self.deployment_id = config.get("deployment_id", "")
+        self.api_key = config.get("api_key", "")
+        self.api_version = config.get("api_version", "")
+        self.weight = max(float(config.get("weight", 1)), 0.01)
+
+    def load(self) -> float:
+        """Calls in flight for this member's weight and health; lowest is picked next"""
+        health = max(self.health, AzureDeploymentPoolConfig["min_health"])
+        return (self.in_flight + 1) / (self.weight * health)
+
+    def record_success(self):
+        decay = AzureDeploymentPoolConfig["health_decay"]
+        self.health = self.health * (1 - decay) + decay
+        self.ejections = 0
+        AzureDeploymentCalls.inc(self.name, "success")
+
+    def record_failure(self, status: Optional[int], retry_after: Optional[float]):
+        self.health *= 1 - AzureDeploymentPoolConfig["health_decay"]
+        AzureDeploymentCalls.inc(self.name, str(status or "connection"))
+        if status == 429:
+            ejection = AzureDeploymentPoolConfig["ejection_seconds"] * (2 ** self.ejections)
+            if retry_after is not None:
+                ejection = retry_after
+            ejection = min(ejection, AzureDeploymentPoolConfig["max_ejection_seconds"])
+            self.ejections += 1
+            self.ejected_until = time.monotonic() + ejection
+            logger.info("Ejected Azure deployment %s for %.1fs after 429", self.name, ejection)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "weight": self.weight,
+            "health": round(self.health, 4),
+            "ejected_for": round(max(self.ejected_until - time.monotonic(), 0.0), 3)
+        }
+
+
+_members: Dict[Tuple[str, str, str], DeploymentMember] = {}
+
+
+def has_deployment_pool() -> bool:
+    return bool(AzureDeploymentPoolConfig["deployments"])
+
+
+def get_deployment_members() -> List[DeploymentMember]:
+    """Members of the configured pool; requests cannot add their own, so the set stays bounded"""
+    members = []
+    for config in AzureDeploymentPoolConfig["deployments"]:
+        key_digest = hashlib.sha256(str(config.get("api_key", "")).encode("utf-8")).hexdigest()[:16]
+        member_key = (config.get("endpoint", ""), config.get("deployment_id", ""), key_digest)
+        member = _members.get(member_key)
+        if member is None:
+            member = DeploymentMember(config.get("name") or f"{member_key[0]}/{member_key[1]}", "/".join(member_key))
+            _members[member_key] = member
+        member.update(config)
+        members.append(member)
+    return members
+
+
+def select_deployment(members: List[DeploymentMember], tried: List[DeploymentMember]) -> Optional[DeploymentMember]:
+    """Least-loaded member not yet tried; ejected members only when nothing else is left"""
+    candidates = [member for member in members if member not in tried]
+    if not candidates:
+        return None
+    now = time.monotonic()
+    available = [member for member in candidates if member.ejected_until <= now]
+    if available:
+        return min(available, key=lambda member: member.load())
+    return min(candidates, key=lambda member: member.ejected_until)
+
+
+async def call_with_failover(
+    members: List[DeploymentMember],
+    send: Callable[[DeploymentMember], Awaitable[Tuple[int, Any]]],
+    streaming: bool
+) -> Tuple[DeploymentMember, int, Any]:
+    """Send to the best member, moving on to the next one after a 429 or 5xx.
+
+    `send` returns (status, body) or raises LlmHttpError. Connection errors
+    move on too, except for streaming calls, which may have sent text to the
+    client already, and so does DeadlineExceeded from a member whose rate
+    limit budget would not refill in time. The last member's error is
+    returned or raised as is.
+    """
+    tried: List[DeploymentMember] = []
+    while True:
+        member = select_deployment(members, tried)
+        tried.append(member)
+        has_next = len(tried) < len(members)
+        member.in_flight += 1
+        try:
+            status, body = await send(member)
+        except LlmHttpError as http_err:
+            member.record_failure(http_err.status, http_err.retry_after)
+            if has_next and (http_err.status == 429 or http_err.status >= 500):
+                continue
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            member.record_failure(None, None)
+            if has_next and not streaming:
+                continue
+            raise
+        except DeadlineExceeded:
+            # Nothing was sent; the member is healthy, just out of local budget
+            if has_next:
+                continue
+            raise
+        finally:
+            member.in_flight -= 1
+
+        if status >= 400:
+            failure = get_last_failure() or {}
+            member.record_failure(status, failure.get("retry_after"))
+            if has_next and (status == 429 or status >= 500):
+                continue
+        else:
+            member.record_success()
+        return member, status, body
+
+
+def get_deployment_stats() -> Dict[str, Any]:
+    return {member.name: member.get_stats() for member in _members.values()}
+
+
+def _collect_deployment_metrics() -> List[str]:
+    members = list(_members.values())
+    lines = AzureDeploymentCalls.render()
+    lines += render_samples(
+        "gateway_azure_deployment_health", "Azure deployment health score (moving success rate)", "gauge",
+        [({"deployment": member.name}, round(member.health, 4)) for member in members]
+    )
+    lines += render_samples(
+        "gateway_azure_deployment_in_flight", "Azure calls in flight per deployment", "gauge",
+        [({"deployment": member.name}, member.in_flight) for member in members]
+    )
+    lines += render_samples(
+        "gateway_azure_deployment_ejected", "1 while the deployment is ejected after a 429", "gauge",
+        [({"deployment": member.name}, int(member.ejected_until > time.monotonic())) for member in members]
+    )
+    return lines
+
+
+register_collector(_collect_deployment_metrics)
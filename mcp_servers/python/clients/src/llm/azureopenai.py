@@ -1,8 +1,18 @@
-import requests
 import json
+import aiohttp
+import asyncio
 from typing import Dict, List, Any, Optional, Union
 from dataclasses import dataclass, field, asdict
 
+from src.llm.http_client import post_json, post_sse, LlmHttpError
+from src.llm.streaming import assemble_openai_stream
+from src.llm.azure_pool import get_deployment_members, call_with_failover, DeploymentMember
+from src.llm.rate_limiter import acquire_member_budget
+from src.deadline import DeadlineExceeded
+
+# First Azure OpenAI API version that accepts stream_options
+_STREAM_USAGE_API_VERSION = "2024-09-01"
+
 @dataclass
 class ChatMessage:
     role: str
@@ -44,9 +54,14 @@ class AzureAndOpenAiChatCompletionParams:
     forced_tool_calls: Optional[Any] = None
     tool_choice: str = 'auto'
 
-async def azure_openai_processor(data: Dict[str, Any]) -> LlmResponseStruct:
+async def azure_openai_processor(data: Dict[str, Any], stream_callbacks: Optional[Any] = None) -> LlmResponseStruct:
     """ 
     Main Azure OpenAI Processor function
+
+    With is_stream set and stream_callbacks given, the completion is streamed and
+    text deltas are forwarded to stream_callbacks.on_data as they arrive. With
+    a deployment pool configured (see azure_pool), the endpoint, deployment and
+    key come from the chosen pool member, recorded in Data["deployment"].
     """
     try:
         # Parse and validate input parameters
@@ -77,8 +92,10 @@ async def azure_openai_processor(data: Dict[str, Any]) -> LlmResponseStruct:
         elif params.input_type == 'audio':
             selected_model = params.speech_model
 
+        members = get_deployment_members()
+
         # Basic validation
-        if not params.api_key:
+        if not params.api_key and not members:
             return LlmResponseStruct(Data=None, Error=Exception("OpenAI API Key is required"), Status=False)
         if params.max_tokens <= 0:
             return LlmResponseStruct(Data=None, Error=Exception("Max tokens must be > 0"), Status=False)
@@ -88,11 +105,12 @@ async def azure_openai_processor(data: Dict[str, Any]) -> LlmResponseStruct:
         messages_arr += [{"role": m.role, "content": m.content} for m in params.chat_history]
 
         # Prepare request payload
+        stream = bool(params.is_stream and stream_callbacks)
         payload = {
             # "model": selected_model,
             "messages": messages_arr,
             "max_tokens": params.max_tokens,
-            "stream": False,
+            "stream": stream,
             "tools": params.tools,
             "tool_choice": params.tool_choice,
             "temperature": params.temperature,
@@ -101,15 +119,41 @@ async def azure_openai_processor(data: Dict[str, Any]) -> LlmResponseStruct:
         # print(f"payload: {payload}")
 
         # Send request
-        endpoint = data.get('endpoint', '')
-        deployment_id = data.get('deployment_id', '')
-        api_version = data.get('api_version', '')
-        url = f"{endpoint}/openai/deployments/{deployment_id}/chat/completions?api-version={api_version}"
-        headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {params.api_key}'}
-
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        response_data = resp.json()
+        async def send(endpoint: str, deployment_id: str, api_version: str, api_key: str):
+            url = f"{endpoint}/openai/deployments/{deployment_id}/chat/completions?api-version={api_version}"
+            headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'}
+            if stream:
+                # Usage in the last chunk; older API versions reject stream_options
+                stream_payload = payload
+                if api_version >= _STREAM_USAGE_API_VERSION:
+                    stream_payload = {**payload, "stream_options": {"include_usage": True}}
+                return 200, await assemble_openai_stream(post_sse("azure_openai", url, headers, stream_payload, data.get("deadline")), stream_callbacks)
+            return await post_json("azure_openai", url, headers, payload, data.get("deadline"))
+
+        async def send_to_member(member: DeploymentMember):
+            # Each member has its own key budget, charged once it is picked
+            admission = await acquire_member_budget(member.budget_id, data, data.get("estimated_call_tokens", 0))
+            status, body = 0, None
+            try:
+                status, body = await send(member.endpoint, member.deployment_id, member.api_version, member.api_key)
+                return status, body
+            finally:
+                if status and status < 400 and isinstance(body, dict):
+                    # A body without usage (older streaming API versions) keeps the estimate charged
+                    admission.settle(body.get("usage", {}).get("total_tokens") or data.get("estimated_call_tokens", 0))
+                else:
+                    admission.settle(0)
+
+        deployment = None
+        if members:
+            member, status, response_data = await call_with_failover(members, send_to_member, stream)
+            deployment = member.name
+        else:
+            status, response_data = await send(
+                data.get('endpoint', ''), data.get('deployment_id', ''), data.get('api_version', ''), params.api_key
+            )
+        if status >= 400:
+            return LlmResponseStruct(Data=None, Error=response_data, Status=False)
 
         # Detect tool calls
         choices = response_data.get('choices', [])
@@ -135,18 +179,19 @@ async def azure_openai_processor(data: Dict[str, Any]) -> LlmResponseStruct:
         # print(f"response: {final_format}")
 
         # Return as dict to avoid subscript errors
-        return LlmResponseStruct(Data=asdict(final_format), Error=None, Status=True)
+        response = asdict(final_format)
+        if deployment is not None:
+            response["deployment"] = deployment
+        return LlmResponseStruct(Data=response, Error=None, Status=True)
 
-    except requests.exceptions.RequestException as req_err:
-        err_data = None
-        if hasattr(req_err, 'response') and req_err.response is not None:
-            try:
-                err_data = req_err.response.json()
-            except ValueError:
-                err_data = req_err.response.text
-        else:
-            err_data = str(req_err)
-        return LlmResponseStruct(Data=None, Error=err_data, Status=False)
+    except DeadlineExceeded:
+        raise
+
+    except LlmHttpError as http_err:
+        return LlmResponseStruct(Data=None, Error=http_err.body, Status=False)
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as req_err:
+        return LlmResponseStruct(Data=None, Error=str(req_err) or type(req_err).__name__, Status=False)
 
     except Exception as err:
         return LlmResponseStruct(Data=None, Error=err, Status=False)
@@ -0,0 +1,105 @@
+import time
+from typing import Dict, Any, Optional
+
+from src.llm.azureopenai import azure_openai_processor
+from src.llm.openai import openai_processor, LlmResponseStruct
+from src.llm.gemini import gemini_processor
+from src.llm.streaming import emit_text_delta
+from src.chat_history import fit_prompt_budget
+from src.deadline import check_deadline
+from src.metrics import LlmLatency, LlmCacheLookups
+from src.llm.rate_limiter import acquire_llm_budget, estimate_call_tokens
+from src.llm.resilience import call_with_resilience
+from src.llm.http_client import reset_last_failure, get_last_failure
+from src.tracing import span
+from src.llm.response_cache import is_cacheable, get_tenant, make_cache_key, get_cached_response, cache_response
+
+
+# selected_client -> (provider name, processor)
+LlmProcessors = {
+    "MCP_CLIENT_AZURE_AI": ("azure_openai", azure_openai_processor),
+    "MCP_CLIENT_OPENAI": ("openai", openai_processor),
+    "MCP_CLIENT_GEMINI": ("gemini", gemini_processor),
+}
+
+
+async def _timed_call(provider: str, processor: Any, client_details: Dict[str, Any], stream_callbacks: Optional[Any], prompt_tokens: int) -> LlmResponseStruct:
+    model = client_details.get("chat_model") or client_details.get("deployment_id") or "unknown"
+    estimated_tokens = estimate_call_tokens(client_details, prompt_tokens)
+    # Processors that charge budgets of their own (Azure pool members) use the same estimate
+    client_details = dict(client_details, estimated_call_tokens=estimated_tokens)
+    queue_waits = []
+
+    async def attempt(callbacks: Optional[Any]):
+        # Rate limit queueing is reported apart from provider latency
+        with span("llm.queue", provider=provider):
+            admission = await acquire_llm_budget(provider, client_details, estimated_tokens)
+        queue_waits.append(admission.wait_seconds)
+
+        reset_last_failure()
+        started_at = time.perf_counter()
+        try:
+            with span(f"llm.{provider}", model=model, stream=bool(callbacks)):
+                response = await processor(client_details, callbacks)
+        finally:
+            LlmLatency.observe(time.perf_counter() - started_at, provider, model)
+
+        if response.Status and response.Data is not None:
+            # A stream without usage keeps the estimate charged rather than refunding it all
+            admission.settle(response.Data.get("total_tokens") or estimated_tokens)
+        else:
+            admission.settle(0)
+        return response, get_last_failure()
+
+    response, stats = await call_with_resilience(provider, model, client_details, attempt, stream_callbacks)
+    if response.Status and response.Data is not None:
+        response.Data["llm_queue_wait_seconds"] = round(sum(queue_waits), 3)
+        response.Data["llm_retries"] = stats["retries"]
+        response.Data["llm_hedged"] = stats["hedged"]
+    return response
+
+
+async def call_llm(selected_client: str, client_details: Dict[str, Any], stream_callbacks: Optional[Any] = None) -> LlmResponseStruct:
+    """Single entry point for every LLM call made by client_and_server_execution.
+
+    chat_history is compacted to fit the prompt token budget first, and
+    deterministic calls are answered from the response cache when possible.
+    Calls sent to a provider first wait for rate limit budget (see
+    rate_limiter) and are retried or hedged as set in LlmResilienceConfig.
+    Response Data carries "llm_cache" ("hit", "miss" or "bypass"), the
+    locally counted "estimated_prompt_tokens", "llm_queue_wait_seconds",
+    "llm_retries" and "llm_hedged"; a hit reports zero LLM calls and
+    tokens, as nothing was sent to the provider.
+    """
+    # Raises DeadlineExceeded rather than starting a call with no time left
+    check_deadline(client_details)
+    provider, processor = LlmProcessors[selected_client]
+    client_details, prompt_tokens = fit_prompt_budget(client_details)
+
+    if not is_cacheable(client_details):
+        LlmCacheLookups.inc(provider, "bypass")
+        response = await _timed_call(provider, processor, client_details, stream_callbacks, prompt_tokens)
+        if response.Status and response.Data is not None:
+            response.Data["llm_cache"] = "bypass"
+            response.Data["estimated_prompt_tokens"] = prompt_tokens
+        return response
+
+    tenant = get_tenant(client_details)
+    key = make_cache_key(provider, client_details)
+    cached = await get_cached_response(tenant, key)
+    LlmCacheLookups.inc(provider, "miss" if cached is None else "hit")
+    if cached is not None:
+        data = dict(cached, total_llm_calls=0, total_tokens=0, total_input_tokens=0, total_output_tokens=0, llm_cache="hit", estimated_prompt_tokens=prompt_tokens, llm_queue_wait_seconds=0, llm_retries=0, llm_hedged=False)
+        if stream_callbacks:
+            for message in data.get("messages", []):
+                if message:
+                    await emit_text_delta(stream_callbacks, message)
+        return LlmResponseStruct(Data=data, Error=None, Status=True)
+
+    response = await _timed_call(provider, processor, client_details, stream_callbacks, prompt_tokens)
+    if response.Status and response.Data is not None:
+        # A hit makes no call, so it must not count toward the deployment that served the original
+        await cache_response(tenant, key, {k: v for k, v in response.Data.items() if k != "deployment"})
+        response.Data["llm_cache"] = "miss"
+        response.Data["estimated_prompt_tokens"] = prompt_tokens
+    return response
@@ -4,6 +4,13 @@ import asyncio
 from typing import Dict, List, Any, Optional, Union
 from dataclasses import dataclass, field, asdict
 
+from src.llm.http_client import post_json, post_sse, LlmHttpError
+from src.llm.streaming import assemble_gemini_stream
+from src.client_and_server_config import LlmHttpClientConfig
+from src.structured_logging import get_logger
+
+logger = get_logger("llm")
+
 # --------------------- Data Models ---------------------
 
 @dataclass
@@ -28,15 +35,47 @@ class LlmResponseStruct:
     Error: Optional[Union[Exception, str, Dict[str, Any]]]
     Status: bool
 
+# --------------------- Tool Declarations ---------------------
+
+# JSON Schema keys MCP servers emit that Gemini's schema rejects
+_UNSUPPORTED_SCHEMA_KEYS = ("$schema", "additionalProperties")
+
+def _gemini_schema(schema: Any) -> Any:
+    if isinstance(schema, dict):
+        return {key: _gemini_schema(value) for key, value in schema.items() if key not in _UNSUPPORTED_SCHEMA_KEYS}
+    if isinstance(schema, list):
+        return [_gemini_schema(value) for value in schema]
+    return schema
+
+def get_function_declarations(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """OpenAI-style tool definitions as Gemini function declarations"""
+    declarations = []
+    for tool in tools:
+        function = tool.get("function", {})
+        declaration = {"name": function.get("name"), "description": function.get("description", "")}
+        parameters = function.get("parameters") or {}
+        # Gemini rejects an object schema without properties; such tools take no arguments
+        if parameters.get("properties"):
+            declaration["parameters"] = _gemini_schema(parameters)
+        declarations.append(declaration)
+    return declarations
+
 # --------------------- Gemini Processor ---------------------
 
-async def gemini_processor(data: Dict[str, Any]) -> LlmResponseStruct:
-    print("DEBUG: Starting gemini_processor")
+async def gemini_processor(data: Dict[str, Any], stream_callbacks: Optional[Any] = None) -> LlmResponseStruct:
+    """
+    Main Gemini Processor function
+
+    Accepts either the full request payload or its client_details. With
+    is_stream set and stream_callbacks given, text deltas are forwarded as they arrive.
+    Tools in client_details are declared as Gemini functions; a reply with
+    functionCall parts comes back as output_type "tool_call".
+    """
     try:
         server_creds = data.get("selected_server_credentials", {}).get("MCP-ABSTRACT", {})
         abstract_api_key = server_creds.get("ABSTRACT_API_KEY")
 
-        client_details = data.get("client_details", {})
+        client_details = data.get("client_details", data)
         gemini_api_key = client_details.get("api_key", "")
         temperature = client_details.get("temperature", 0.1)
         max_tokens = client_details.get("max_token", 1000)
@@ -66,17 +105,26 @@ async def gemini_processor(data: Dict[str, Any]) -> LlmResponseStruct:
             }
         }
 
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{chat_model}:generateContent?key={gemini_api_key}"
+        function_declarations = get_function_declarations(client_details.get("tools") or [])
+        if function_declarations:
+            payload["tools"] = [{"function_declarations": function_declarations}]
+
+        base_url = LlmHttpClientConfig['base_urls']['gemini']
         headers = {'Content-Type': 'application/json'}
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload, timeout=60) as response:
-                response.raise_for_status()
-                response_data = await response.json()
+        if client_details.get("is_stream") and stream_callbacks:
+            url = f"{base_url}/v1beta/models/{chat_model}:streamGenerateContent?alt=sse&key={gemini_api_key}"
+            response_data = await assemble_gemini_stream(post_sse("gemini", url, headers, payload, client_details.get("deadline")), stream_callbacks)
+        else:
+            url = f"{base_url}/v1beta/models/{chat_model}:generateContent?key={gemini_api_key}"
+            status, response_data = await post_json("gemini", url, headers, payload, client_details.get("deadline"))
+            if status >= 400:
+                return LlmResponseStruct(Data=None, Error=f"HTTP error: {status}, {response_data}", Status=False)
 
         candidates = response_data.get("candidates", [])
         parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
-        message_text = parts[0].get("text", "") if parts else "No response"
+        message_text = next((part["text"] for part in parts if part.get("text")), "" if parts else "No response")
+        is_tool_call = any(part.get("functionCall") for part in parts)
         usage = response_data.get("usageMetadata", {})
 
         success_data = SuccessResponseDataFormat(
@@ -87,18 +135,17 @@ async def gemini_processor(data: Dict[str, Any]) -> LlmResponseStruct:
             final_llm_response=response_data,
             llm_responses_arr=[response_data],
             messages=[message_text],
-            output_type="text"
+            output_type="tool_call" if is_tool_call else "text"
         )
 
-        response = LlmResponseStruct(Data=asdict(success_data), Error=None, Status=True)
-        print("DEBUG: Returning LlmResponseStruct:", response)
-        print("DEBUG: Response type:", type(response))
-        return response
+        return LlmResponseStruct(Data=asdict(success_data), Error=None, Status=True)
+
+    except LlmHttpError as http_err:
+        return LlmResponseStruct(Data=None, Error=f"HTTP error: {http_err.status}, {http_err.body}", Status=False)
 
-    except aiohttp.ClientError as req_err:
-        error_response = LlmResponseStruct(Data=None, Error=f"HTTP error: {str(req_err)}", Status=False)
-        print("DEBUG: Returning error LlmResponseStruct:", error_response)
-        return error_response
+    except (aiohttp.ClientError, asyncio.TimeoutError) as req_err:
+        logger.warning("Gemini request failed: %s", req_err)
+        return LlmResponseStruct(Data=None, Error=f"HTTP error: {str(req_err)}", Status=False)
 
     except Exception as err:
         return LlmResponseStruct(Data=None, Error=f"Unhandled error: {str(err)}", Status=False)
@@ -0,0 +1,178 @@
+import time
+import asyncio
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Tuple, AsyncIterator
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from src.json_codec import dumps, loads
+from src.client_and_server_config import LlmHttpClientConfig
+from src.structured_logging import get_logger
+
+logger = get_logger("llm")
+
+
+# Process-wide keep-alive sessions shared by all LLM adapters, keyed by provider
+# base URL (scheme://host[:port]). Created in startup() and closed in shutdown().
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+
+# The last failed provider request in this task, as {"status", "retry_after"}
+# (status None for connection errors and timeouts). The adapters report
+# failures as LlmResponseStruct(Status=False) without the HTTP status, so the
+# retry layer reads it from here.
+_last_failure: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_last_failure", default=None)
+
+
+class LlmHttpError(Exception):
+    """Non-2xx response from a provider; `body` is the decoded JSON or raw text"""
+
+    def __init__(self, status: int, body: Any, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {body}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+def reset_last_failure():
+    _last_failure.set(None)
+
+
+def get_last_failure() -> Optional[Dict[str, Any]]:
+    return _last_failure.get()
+
+
+def parse_retry_after(headers: Any) -> Optional[float]:
+    """Seconds from retry-after-ms or Retry-After (delta seconds or an HTTP date)"""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_base_url(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _create_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=LlmHttpClientConfig["pool_limit"],
+        limit_per_host=LlmHttpClientConfig["pool_limit_per_host"],
+        keepalive_timeout=LlmHttpClientConfig["keepalive_timeout"],
+        ttl_dns_cache=LlmHttpClientConfig["ttl_dns_cache"]
+    )
+    return aiohttp.ClientSession(connector=connector, json_serialize=dumps)
+
+
+def get_http_session(url: str) -> aiohttp.ClientSession:
+    """Session for the base URL of `url`; created lazily for endpoints not warmed at startup"""
+    base_url = get_base_url(url)
+    session = _sessions.get(base_url)
+    if session is None or session.closed:
+        session = _create_session()
+        _sessions[base_url] = session
+    return session
+
+
+async def _warm_up(base_url: str):
+    # Any response will do: the point is to leave a resolved, TLS-established
+    # connection in the pool before the first LLM call needs it
+    try:
+        timeout = aiohttp.ClientTimeout(total=LlmHttpClientConfig["warm_up_timeout"])
+        async with get_http_session(base_url).head(base_url, timeout=timeout) as resp:
+            await resp.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+        logger.warning("Warm-up of %s failed: %s", base_url, err)
+
+
+async def start_http_client():
+    base_urls = {get_base_url(url) for url in LlmHttpClientConfig["base_urls"].values()}
+    await asyncio.gather(*(_warm_up(base_url) for base_url in base_urls))
+
+
+async def close_http_client():
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        if not session.closed:
+            await session.close()
+
+
+def get_provider_timeout(provider: str, deadline: Optional[float] = None) -> aiohttp.ClientTimeout:
+    """Provider timeout, shortened to what is left of the request deadline (time.monotonic() based)"""
+    timeouts = LlmHttpClientConfig["timeouts"]
+    total = timeouts.get(provider, timeouts["default"])
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("Request deadline exceeded")
+        total = min(total, remaining)
+    return aiohttp.ClientTimeout(total=total)
+
+
+async def post_json(provider: str, url: str, headers: Dict[str, str], payload: Dict[str, Any], deadline: Optional[float] = None) -> Tuple[int, Any]:
+    """POST a JSON payload on the shared session and return (status, decoded body).
+
+    The body falls back to raw text when it is not valid JSON, mirroring how the
+    adapters report provider errors.
+    """
+    session = get_http_session(url)
+    try:
+        async with session.post(url, headers=headers, json=payload, timeout=get_provider_timeout(provider, deadline)) as resp:
+            body = await resp.text()
+            if resp.status >= 400:
+                _last_failure.set({"status": resp.status, "retry_after": parse_retry_after(resp.headers)})
+            try:
+                return resp.status, loads(body)
+            except ValueError:
+                return resp.status, body
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        _last_failure.set({"status": None, "retry_after": None})
+        raise
+
+
+async def post_sse(provider: str, url: str, headers: Dict[str, str], payload: Dict[str, Any], deadline: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+    """POST a streaming request and yield each server-sent event's JSON data as it arrives.
+
+    Raises LlmHttpError for non-2xx responses. The OpenAI "[DONE]" sentinel ends the stream.
+    """
+    session = get_http_session(url)
+    try:
+        async with session.post(url, headers=headers, json=payload, timeout=get_provider_timeout(provider, deadline)) as resp:
+            if resp.status >= 400:
+                body = await resp.text()
+                try:
+                    body = loads(body)
+                except ValueError:
+                    pass
+                retry_after = parse_retry_after(resp.headers)
+                _last_failure.set({"status": resp.status, "retry_after": retry_after})
+                raise LlmHttpError(resp.status, body, retry_after)
+
+            async for raw_line in resp.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                if data:
+                    yield loads(data)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        _last_failure.set({"status": None, "retry_after": None})
+        raise
@@ -1,8 +1,13 @@
-import requests
 import json
+import aiohttp
+import asyncio
 from typing import Dict, List, Any, Optional, Union
 from dataclasses import dataclass, field, asdict
 
+from src.llm.http_client import post_json, post_sse, LlmHttpError
+from src.llm.streaming import assemble_openai_stream
+from src.client_and_server_config import LlmHttpClientConfig
+
 @dataclass
 class ChatMessage:
     role: str
@@ -44,9 +49,12 @@ class AzureAndOpenAiChatCompletionParams:
     forced_tool_calls: Optional[Any] = None
     tool_choice: str = 'auto'
 
-async def openai_processor(data: Dict[str, Any]) -> LlmResponseStruct:
+async def openai_processor(data: Dict[str, Any], stream_callbacks: Optional[Any] = None) -> LlmResponseStruct:
     """ 
     Main OpenAI Processor function
+
+    With is_stream set and stream_callbacks given, the completion is streamed and
+    text deltas are forwarded to stream_callbacks.on_data as they arrive.
     """
     try:
         # Parse and validate input parameters
@@ -88,25 +96,31 @@ async def openai_processor(data: Dict[str, Any]) -> LlmResponseStruct:
         messages_arr += [{"role": m.role, "content": m.content} for m in params.chat_history]
 
         # Prepare request payload
+        stream = bool(params.is_stream and stream_callbacks)
         payload = {
             "model": selected_model,
             "messages": messages_arr,
             "max_tokens": params.max_tokens,
-            "stream": False,
+            "stream": stream,
             "tools": params.tools,
             "tool_choice": params.tool_choice,
             "temperature": params.temperature,
         }
+        if stream:
+            payload["stream_options"] = {"include_usage": True}
         
         # print(f"payload: {payload}")
 
         # Send request
-        url = f"https://api.openai.com/v1/chat/completions"
+        url = f"{LlmHttpClientConfig['base_urls']['openai']}/v1/chat/completions"
         headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {params.api_key}'}
 
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
-        response_data = resp.json()
+        if stream:
+            response_data = await assemble_openai_stream(post_sse("openai", url, headers, payload, data.get("deadline")), stream_callbacks)
+        else:
+            status, response_data = await post_json("openai", url, headers, payload, data.get("deadline"))
+            if status >= 400:
+                return LlmResponseStruct(Data=None, Error=response_data, Status=False)
 
         # Detect tool calls
         choices = response_data.get('choices', [])
@@ -134,16 +148,11 @@ async def openai_processor(data: Dict[str, Any]) -> LlmResponseStruct:
         # Return as dict to avoid subscript errors
         return LlmResponseStruct(Data=asdict(final_format), Error=None, Status=True)
 
-    except requests.exceptions.RequestException as req_err:
-        err_data = None
-        if hasattr(req_err, 'response') and req_err.response is not None:
-            try:
-                err_data = req_err.response.json()
-            except ValueError:
-                err_data = req_err.response.text
-        else:
-            err_data = str(req_err)
-        return LlmResponseStruct(Data=None, Error=err_data, Status=False)
+    except LlmHttpError as http_err:
+        return LlmResponseStruct(Data=None, Error=http_err.body, Status=False)
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as req_err:
+        return LlmResponseStruct(Data=None, Error=str(req_err) or type(req_err).__name__, Status=False)
 
     except Exception as err:
         return LlmResponseStruct(Data=None, Error=err, Status=False)
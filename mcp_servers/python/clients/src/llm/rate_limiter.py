@@ -0,0 +1,170 @@
+import time
+import asyncio
+import hashlib
+from typing import Dict, Any, List, Tuple
+
+from src.ttl_cache import TTLCache
+from src.client_and_server_config import RateLimitConfig
+from src.deadline import DeadlineExceeded, remaining_time
+from src.metrics import LlmQueueWait, LlmQueuedCalls
+from src.llm.azure_pool import has_deployment_pool
+
+
+# Requests- and tokens-per-minute admission in front of the provider calls.
+# Calls take their budget before being sent and wait, first come first served
+# per tenant (or per API key), while it refills. Token budgets are charged
+# with an estimate up front (prompt tokens plus max_tokens) and corrected
+# with the provider's reported usage once the call returns.
+
+class TokenBucket:
+    """`per_minute` units, refilled continuously; the level may go negative when usage beats the estimate"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` (at most a full bucket) can be taken"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        self.level -= amount
+        return amount
+
+    def adjust(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class _Budget:
+    def __init__(self, limits: Dict[str, int]):
+        self.requests = TokenBucket(limits["rpm"]) if limits.get("rpm") else None
+        self.tokens = TokenBucket(limits["tpm"]) if limits.get("tpm") else None
+        self.lock = asyncio.Lock()
+
+
+# ("key" | "tenant", provider, id) -> _Budget. Each use pushes the expiry back,
+# so only budgets idle for 10 minutes are dropped (they would have refilled anyway)
+_budgets = TTLCache(RateLimitConfig["max_keys"], 600, sliding=True)
+
+
+def _get_budget(scope: str, provider: str, budget_id: str, limits: Dict[str, int]) -> _Budget:
+    budget_key = (scope, provider, budget_id)
+    budget = _budgets.get(budget_key)
+    if budget is None:
+        budget = _Budget(limits)
+        _budgets.set(budget_key, budget)
+    return budget
+
+
+def _get_budgets(provider: str, client_details: Dict[str, Any]) -> List[_Budget]:
+    """Tenant budget (when the request names a tenant) first, then the API key's.
+
+    Azure calls through the deployment pool take no key budget here: each
+    member has its own, taken with acquire_member_budget once azure_pool
+    has picked the member.
+    """
+    budgets = []
+    tenant_id = client_details.get("tenant_id")
+    if tenant_id:
+        limits = RateLimitConfig["tenant_overrides"].get(str(tenant_id), RateLimitConfig["tenant"])
+        budgets.append(_get_budget("tenant", provider, str(tenant_id), limits))
+    provider_limits = RateLimitConfig["providers"].get(provider)
+    if provider == "azure_openai" and has_deployment_pool():
+        provider_limits = None
+    if provider_limits:
+        key_digest = hashlib.sha256(str(client_details.get("api_key", "")).encode("utf-8")).hexdigest()[:32]
+        budgets.append(_get_budget("key", provider, key_digest, provider_limits))
+    return budgets
+
+
+def estimate_call_tokens(client_details: Dict[str, Any], prompt_tokens: int) -> int:
+    max_tokens = client_details.get("max_tokens", client_details.get("max_token", 1000))
+    try:
+        return prompt_tokens + max(int(max_tokens), 0)
+    except (TypeError, ValueError):
+        return prompt_tokens + 1000
+
+
+class LlmAdmission:
+    """Budget taken for one LLM call; settle() charges the difference from actual usage"""
+
+    def __init__(self, charges: List[Tuple[TokenBucket, float]], wait_seconds: float):
+        # (token bucket, amount taken from it)
+        self.charges = charges
+        self.wait_seconds = wait_seconds
+
+    def settle(self, actual_tokens: int):
+        for bucket, taken in self.charges:
+            bucket.adjust(actual_tokens - taken)
+
+
+def _wait_time(budgets: List[_Budget], estimated_tokens: int) -> float:
+    wait = 0.0
+    for budget in budgets:
+        if budget.requests is not None:
+            wait = max(wait, budget.requests.wait_time(1))
+        if budget.tokens is not None:
+            wait = max(wait, budget.tokens.wait_time(estimated_tokens))
+    return wait
+
+
+async def acquire_llm_budget(provider: str, client_details: Dict[str, Any], estimated_tokens: int) -> LlmAdmission:
+    """Wait until the call fits every budget it is subject to, then take it.
+
+    Raises DeadlineExceeded when the budget would not refill before the
+    request deadline, instead of sending a call that would be rate limited.
+    """
+    budgets = _get_budgets(provider, client_details) if RateLimitConfig["enabled"] else []
+    return await _acquire(provider, budgets, client_details, estimated_tokens)
+
+
+async def acquire_member_budget(member_id: str, client_details: Dict[str, Any], estimated_tokens: int) -> LlmAdmission:
+    """Key budget of one Azure deployment pool member, with the provider's limits"""
+    limits = RateLimitConfig["providers"].get("azure_openai")
+    budgets = [_get_budget("key", "azure_openai", member_id, limits)] if RateLimitConfig["enabled"] and limits else []
+    return await _acquire("azure_openai", budgets, client_details, estimated_tokens)
+
+
+async def _acquire(provider: str, budgets: List[_Budget], client_details: Dict[str, Any], estimated_tokens: int) -> LlmAdmission:
+    if not budgets:
+        return LlmAdmission([], 0.0)
+
+    started_at = time.perf_counter()
+    queued = budgets[0].lock.locked() or _wait_time(budgets, estimated_tokens) > 0
+    if queued:
+        LlmQueuedCalls.inc(provider)
+    try:
+        # Callers sharing the first (most specific) budget queue in arrival order
+        async with budgets[0].lock:
+            while True:
+                wait = _wait_time(budgets, estimated_tokens)
+                if wait <= 0:
+                    break
+                remaining = remaining_time(client_details)
+                if remaining is not None and wait > remaining:
+                    raise DeadlineExceeded(f"{provider} rate limit budget does not refill before the request deadline")
+                await asyncio.sleep(wait)
+            charges = []
+            for budget in budgets:
+                if budget.requests is not None:
+                    budget.requests.take(1)
+                if budget.tokens is not None:
+                    charges.append((budget.tokens, budget.tokens.take(estimated_tokens)))
+    finally:
+        waited = time.perf_counter() - started_at
+        LlmQueueWait.observe(waited, provider)
+        if queued:
+            LlmQueuedCalls.dec(provider)
+    return LlmAdmission(charges, waited)
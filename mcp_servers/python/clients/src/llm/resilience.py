@@ -0,0 +1,182 @@
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+
+from src.client_and_server_config import LlmResilienceConfig
+from src.deadline import remaining_time
+from src.metrics import LlmRetries, LlmHedges
+from src.structured_logging import get_logger
+
+logger = get_logger("llm")
+
+
+# Retries with backoff and hedged requests around one logical LLM call.
+# An attempt is a coroutine returning (LlmResponseStruct, failure), where
+# failure is the http_client record of the failed provider request (None
+# when the adapter failed for a non-HTTP reason, which is never retried).
+
+Attempt = Callable[[Optional[Any]], Awaitable[Tuple[Any, Optional[Dict[str, Any]]]]]
+
+
+class RetryBudget:
+    """Retries and hedges earn `ratio` per call plus `min_per_second`, capped at `max_balance`"""
+
+    def __init__(self, ratio: float, min_per_second: float, max_balance: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self.balance = max_balance
+        self.updated = time.monotonic()
+
+    def _refill(self, earned: float = 0.0):
+        now = time.monotonic()
+        self.balance = min(self.max_balance, self.balance + (now - self.updated) * self.min_per_second + earned)
+        self.updated = now
+
+    def record_call(self):
+        self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+_budgets: Dict[str, RetryBudget] = {}
+# (provider, model) -> recent successful non-streaming call latencies
+_latencies: Dict[Tuple[str, str], deque] = {}
+
+
+def _get_budget(provider: str) -> RetryBudget:
+    budget = _budgets.get(provider)
+    if budget is None:
+        budget = RetryBudget(
+            LlmResilienceConfig["retry_budget_ratio"],
+            LlmResilienceConfig["retry_budget_min_per_second"],
+            LlmResilienceConfig["retry_budget_max"]
+        )
+        _budgets[provider] = budget
+    return budget
+
+
+def _record_latency(provider: str, model: str, seconds: float):
+    samples = _latencies.get((provider, model))
+    if samples is None:
+        samples = deque(maxlen=LlmResilienceConfig["latency_window"])
+        _latencies[(provider, model)] = samples
+    samples.append(seconds)
+
+
+def get_hedge_delay(provider: str, model: str) -> Optional[float]:
+    """hedge_percentile of recent latencies (at least hedge_min_delay), or None until there are enough samples"""
+    samples = _latencies.get((provider, model))
+    if not samples or len(samples) < LlmResilienceConfig["hedge_min_samples"]:
+        return None
+    ordered = sorted(samples)
+    index = min(int(len(ordered) * LlmResilienceConfig["hedge_percentile"]), len(ordered) - 1)
+    return max(ordered[index], LlmResilienceConfig["hedge_min_delay"])
+
+
+def is_retryable(failure: Optional[Dict[str, Any]]) -> bool:
+    if failure is None:
+        return False
+    return failure["status"] is None or failure["status"] in LlmResilienceConfig["retry_statuses"]
+
+
+def get_backoff(retry: int, failure: Dict[str, Any]) -> float:
+    """Retry-After when the provider sent one, otherwise full-jitter exponential backoff"""
+    if failure.get("retry_after") is not None:
+        return min(failure["retry_after"], LlmResilienceConfig["max_retry_after"])
+    ceiling = min(LlmResilienceConfig["backoff_initial"] * (2 ** retry), LlmResilienceConfig["backoff_max"])
+    return random.uniform(0, ceiling)
+
+
+class _EmitTracker:
+    """Stream handler proxy that remembers whether anything reached the client"""
+
+    def __init__(self, stream_callbacks: Any):
+        self._stream_callbacks = stream_callbacks
+        self.emitted = False
+
+    async def on_data(self, chunk: str):
+        self.emitted = True
+        await self._stream_callbacks.on_data(chunk)
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream_callbacks, name)
+
+
+async def _timed_attempt(attempt: Attempt, provider: str, model: str, stream_callbacks: Optional[Any]):
+    started_at = time.perf_counter()
+    response, failure = await attempt(stream_callbacks)
+    if response.Status and stream_callbacks is None:
+        _record_latency(provider, model, time.perf_counter() - started_at)
+    return response, failure
+
+
+async def _hedged_attempt(attempt: Attempt, provider: str, model: str, hedge_delay: float, budget: RetryBudget):
+    """Run the attempt; if it is still running after hedge_delay, race a second one against it"""
+    primary = asyncio.create_task(_timed_attempt(attempt, provider, model, None))
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    if done or not budget.try_spend():
+        return await primary, False
+
+    hedge = asyncio.create_task(_timed_attempt(attempt, provider, model, None))
+    pending = {primary, hedge}
+    result = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if result[0].Status:
+                    LlmHedges.inc(provider, "hedge_won" if task is hedge else "primary_won")
+                    return result, True
+        LlmHedges.inc(provider, "both_failed")
+        return result, True
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_resilience(provider: str, model: str, client_details: Dict[str, Any], attempt: Attempt, stream_callbacks: Optional[Any] = None):
+    """Make one logical LLM call. Returns (response, {"retries", "hedged"})."""
+    budget = _get_budget(provider)
+    budget.record_call()
+    tracker = _EmitTracker(stream_callbacks) if stream_callbacks else None
+    hedge_delay = None
+    if LlmResilienceConfig["hedging_enabled"] and tracker is None:
+        hedge_delay = get_hedge_delay(provider, model)
+
+    retries = 0
+    hedged = False
+    while True:
+        if hedge_delay is not None:
+            (response, failure), hedged_now = await _hedged_attempt(attempt, provider, model, hedge_delay, budget)
+            hedged = hedged or hedged_now
+        else:
+            response, failure = await _timed_attempt(attempt, provider, model, tracker)
+
+        if response.Status or retries >= LlmResilienceConfig["max_retries"] or not is_retryable(failure):
+            break
+        # Text already streamed to the client cannot be taken back
+        if tracker is not None and tracker.emitted:
+            break
+        delay = get_backoff(retries, failure)
+        remaining = remaining_time(client_details)
+        if remaining is not None and delay >= remaining:
+            break
+        if not budget.try_spend():
+            logger.warning("Retry budget for %s exhausted, not retrying", provider)
+            break
+
+        retries += 1
+        LlmRetries.inc(provider, str(failure["status"] or "connection"))
+        logger.info("Retrying %s call in %.2fs", provider, delay, extra={"status": failure["status"], "retry": retries})
+        await asyncio.sleep(delay)
+
+    return response, {"retries": retries, "hedged": hedged}
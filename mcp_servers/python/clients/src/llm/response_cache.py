@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+
+from src.ttl_cache import TTLCache
+from src.client_and_server_config import LlmResponseCacheConfig
+from src.structured_logging import get_logger
+
+logger = get_logger("cache")
+
+
+# Opt-in cache for deterministic (temperature ~0) LLM calls: an in-memory LRU
+# in front of an SQLite file. Entries are namespaced per tenant.
+_memory_cache = TTLCache(LlmResponseCacheConfig["memory_max_entries"], LlmResponseCacheConfig["ttl_seconds"])
+
+_db: Optional[sqlite3.Connection] = None
+_db_lock = threading.Lock()
+
+# Fields of client_details that change what the provider returns
+_KEY_FIELDS = (
+    "prompt", "chat_history", "tools", "tool_choice", "temperature", "max_tokens", "max_token",
+    "input", "input_type", "chat_model", "vision_model", "speech_model", "endpoint", "deployment_id", "api_version"
+)
+
+
+def is_cacheable(client_details: Dict[str, Any]) -> bool:
+    if not LlmResponseCacheConfig["enabled"] or client_details.get("llm_cache_bypass"):
+        return False
+    return client_details.get("temperature", 0.1) <= LlmResponseCacheConfig["max_temperature"]
+
+
+def get_tenant(client_details: Dict[str, Any]) -> str:
+    """Explicit tenant id, otherwise a digest of the provider key so keys never share entries"""
+    if client_details.get("tenant_id"):
+        return str(client_details["tenant_id"])
+    return "key:" + hashlib.sha256(str(client_details.get("api_key", "")).encode("utf-8")).hexdigest()[:32]
+
+
+def make_cache_key(provider: str, client_details: Dict[str, Any]) -> str:
+    material = {"provider": provider}
+    for field_name in _KEY_FIELDS:
+        if field_name in client_details:
+            material[field_name] = client_details[field_name]
+    canonical = json.dumps(material, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _get_db() -> sqlite3.Connection:
+    global _db
+    if _db is None:
+        path = LlmResponseCacheConfig["sqlite_path"]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        _db = sqlite3.connect(path, check_same_thread=False)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            "tenant TEXT NOT NULL, key TEXT NOT NULL, created_at REAL NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (tenant, key))"
+        )
+        _db.commit()
+    return _db
+
+
+def _disk_get(tenant: str, key: str) -> Optional[Dict[str, Any]]:
+    with _db_lock:
+        row = _get_db().execute(
+            "SELECT created_at, data FROM llm_responses WHERE tenant = ? AND key = ?", (tenant, key)
+        ).fetchone()
+    if row is None or row[0] + LlmResponseCacheConfig["ttl_seconds"] < time.time():
+        return None
+    return json.loads(row[1])
+
+
+def _disk_set(tenant: str, key: str, data: Dict[str, Any]):
+    encoded = json.dumps(data, default=str)
+    with _db_lock:
+        db = _get_db()
+        db.execute(
+            "INSERT OR REPLACE INTO llm_responses (tenant, key, created_at, data) VALUES (?, ?, ?, ?)",
+            (tenant, key, time.time(), encoded)
+        )
+        db.commit()
+
+
+async def get_cached_response(tenant: str, key: str) -> Optional[Dict[str, Any]]:
+    data = _memory_cache.get((tenant, key))
+    if data is None and LlmResponseCacheConfig["disk_enabled"]:
+        # SQLite I/O runs off the event loop; a locked or corrupt file is a miss
+        try:
+            data = await asyncio.to_thread(_disk_get, tenant, key)
+        except Exception as err:
+            logger.warning("Error reading LLM response cache: %s", err)
+            data = None
+        if data is not None:
+            _memory_cache.set((tenant, key), data)
+    return data
+
+
+async def cache_response(tenant: str, key: str, data: Dict[str, Any]):
+    _memory_cache.set((tenant, key), data)
+    if LlmResponseCacheConfig["disk_enabled"]:
+        try:
+            await asyncio.to_thread(_disk_set, tenant, key, data)
+        except Exception as err:
+            logger.warning("Error writing LLM response cache: %s", err)
+
+
+def close_response_cache():
+    global _db
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+            _db = None
+    _memory_cache.clear()
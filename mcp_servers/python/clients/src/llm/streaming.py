@@ -0,0 +1,102 @@
+from typing import Dict, List, Any, Optional, AsyncIterator
+
+from src.json_codec import dumps
+
+
+async def emit_text_delta(stream_callbacks: Any, text: str):
+    """Forward one chunk of generated text to the SSE stream"""
+    await stream_callbacks.on_data(dumps({
+        "Data": text,
+        "Error": None,
+        "Status": True,
+        "StreamingStatus": "IN-PROGRESS",
+        "Action": "MESSAGE-DELTA"
+    }))
+
+
+async def assemble_openai_stream(events: AsyncIterator[Dict[str, Any]], stream_callbacks: Optional[Any] = None) -> Dict[str, Any]:
+    """Consume OpenAI/Azure chat completion chunks into a non-streaming response body.
+
+    Text deltas are forwarded as they arrive. Tool-call deltas are merged by
+    their index, so the result carries complete tool_calls just like a
+    non-streaming completion and the tool loop can run on it unchanged.
+    """
+    response_data: Dict[str, Any] = {}
+    content_parts: List[str] = []
+    tool_calls: Dict[int, Dict[str, Any]] = {}
+    finish_reason = None
+
+    async for chunk in events:
+        for key in ("id", "model", "created", "object"):
+            if key in chunk and key not in response_data:
+                response_data[key] = chunk[key]
+        if chunk.get("usage"):
+            response_data["usage"] = chunk["usage"]
+
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or {}
+            if choice.get("finish_reason"):
+                finish_reason = choice["finish_reason"]
+
+            text = delta.get("content")
+            if text:
+                content_parts.append(text)
+                if stream_callbacks:
+                    await emit_text_delta(stream_callbacks, text)
+
+            for tool_delta in delta.get("tool_calls") or []:
+                tool_call = tool_calls.setdefault(tool_delta.get("index", 0), {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if tool_delta.get("id"):
+                    tool_call["id"] = tool_delta["id"]
+                function_delta = tool_delta.get("function") or {}
+                if function_delta.get("name"):
+                    tool_call["function"]["name"] += function_delta["name"]
+                if function_delta.get("arguments"):
+                    tool_call["function"]["arguments"] += function_delta["arguments"]
+
+    message: Dict[str, Any] = {"role": "assistant", "content": "".join(content_parts) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+
+    response_data["choices"] = [{"index": 0, "message": message, "finish_reason": finish_reason}]
+    response_data.setdefault("usage", {})
+    return response_data
+
+
+async def assemble_gemini_stream(events: AsyncIterator[Dict[str, Any]], stream_callbacks: Optional[Any] = None) -> Dict[str, Any]:
+    """Consume streamGenerateContent chunks into a single generateContent response body"""
+    text_parts: List[str] = []
+    function_call_parts: List[Dict[str, Any]] = []
+    finish_reason = None
+    usage: Dict[str, Any] = {}
+
+    async for chunk in events:
+        if chunk.get("usageMetadata"):
+            usage = chunk["usageMetadata"]
+        candidates = chunk.get("candidates") or []
+        if not candidates:
+            continue
+        if candidates[0].get("finishReason"):
+            finish_reason = candidates[0]["finishReason"]
+
+        for part in candidates[0].get("content", {}).get("parts", []):
+            if part.get("text"):
+                text_parts.append(part["text"])
+                if stream_callbacks:
+                    await emit_text_delta(stream_callbacks, part["text"])
+            elif part.get("functionCall"):
+                function_call_parts.append(part)
+
+    parts = ([{"text": "".join(text_parts)}] if text_parts else []) + function_call_parts
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": parts},
+            "finishReason": finish_reason,
+            "index": 0
+        }],
+        "usageMetadata": usage
+    }
@@ -0,0 +1,78 @@
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.ttl_cache import TTLCache
+from src.client_and_server_config import ToolResultBlobConfig
+
+
+# ref -> (mime type, base64 data) for blobs taken out of tool results, capped by total base64 size
+_blob_store = TTLCache(
+    ToolResultBlobConfig["max_entries"], ToolResultBlobConfig["ttl_seconds"],
+    max_size=ToolResultBlobConfig["max_bytes"], sizeof=lambda blob: len(blob[1])
+)
+
+
+def _blob_ref(data: str, mime_type: Optional[str]) -> Dict[str, Any]:
+    """Inline small blobs; larger ones are stored and referenced by content hash"""
+    if len(data) <= ToolResultBlobConfig["inline_max_bytes"]:
+        return {"data": data}
+    ref = hashlib.sha256(data.encode("ascii", errors="replace")).hexdigest()
+    if not _blob_store.set(ref, (mime_type, data)):
+        # Bigger than the whole store; storing it would only evict everything else
+        return {"data": data}
+    # base64 is 4 characters per 3 bytes
+    return {"blob_ref": ref, "size": len(data) * 3 // 4}
+
+
+def get_blob(ref: str) -> Optional[Tuple[Optional[str], str]]:
+    return _blob_store.get(ref)
+
+
+def _normalize_resource(resource: Any) -> Dict[str, Any]:
+    item: Dict[str, Any] = {"uri": str(resource.uri)}
+    mime_type = getattr(resource, "mimeType", None)
+    if mime_type:
+        item["mimeType"] = mime_type
+    text = getattr(resource, "text", None)
+    if text is not None:
+        item["text"] = text
+    blob = getattr(resource, "blob", None)
+    if blob is not None:
+        blob_item = _blob_ref(blob, mime_type)
+        item.update({"blob": blob_item["data"]} if "data" in blob_item else blob_item)
+    return item
+
+
+def _normalize_content(content: Any) -> Dict[str, Any]:
+    content_type = getattr(content, "type", None)
+    if content_type == "text":
+        return {"type": "text", "text": content.text}
+    if content_type in ("image", "audio"):
+        return {"type": content_type, "mimeType": content.mimeType, **_blob_ref(content.data, content.mimeType)}
+    if content_type == "resource":
+        return {"type": "resource", "resource": _normalize_resource(content.resource)}
+    if content_type == "resource_link":
+        item = {"type": "resource_link", "uri": str(content.uri), "name": content.name}
+        for key in ("description", "mimeType"):
+            if getattr(content, key, None):
+                item[key] = getattr(content, key)
+        return item
+    # Content types added by newer protocol versions
+    model_dump = getattr(content, "model_dump", None)
+    if model_dump is not None:
+        return model_dump(mode="json", exclude_none=True)
+    return {"type": "text", "text": str(content)}
+
+
+def normalize_call_tool_result(raw_result: Any) -> Dict[str, Any]:
+    """Wire form of a CallToolResult built in a single pass.
+
+    {"content": [...], "isError": bool, "structuredContent": {...}?}; fields
+    that are None are left out and large blobs become {"blob_ref", "size"}.
+    """
+    content: List[Dict[str, Any]] = [_normalize_content(item) for item in (getattr(raw_result, "content", None) or [])]
+    wire: Dict[str, Any] = {"content": content, "isError": bool(getattr(raw_result, "isError", False))}
+    structured = getattr(raw_result, "structuredContent", None)
+    if structured is not None:
+        wire["structuredContent"] = structured
+    return wire
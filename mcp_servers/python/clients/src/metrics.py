@@ -0,0 +1,156 @@
+import math
+from bisect import bisect_left
+from typing import Dict, Any, List, Tuple, Callable
+
+from src.structured_logging import get_logger
+
+logger = get_logger("api")
+
+
+# In-process metrics rendered in the Prometheus text format at /metrics.
+# Everything runs on the event loop thread, so recording is a dict lookup and
+# a few integer increments with no locking.
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+_ITERATION_BUCKETS = (0, 1, 2, 3, 4, 5, 7, 10, 15, 20)
+_STREAM_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: Any):
+        series = self._series.get(label_values)
+        if series is None:
+            series = [0] * (len(self.buckets) + 1) + [0.0]
+            self._series[label_values] = series
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                le = _format_labels(self.label_names, label_values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, *label_values: Any, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: Any, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) - amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for label_values, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Gauge):
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} counter"
+        return lines
+
+
+LlmLatency = Histogram(
+    "gateway_llm_request_duration_seconds", "LLM provider call latency", ("provider", "model"), _LATENCY_BUCKETS
+)
+ToolLatency = Histogram(
+    "gateway_tool_call_duration_seconds", "MCP tool call latency", ("server", "tool"), _LATENCY_BUCKETS
+)
+RequestTokens = Histogram("gateway_request_tokens", "LLM tokens used per request", ("client",), _TOKEN_BUCKETS)
+ToolLoopIterations = Histogram(
+    "gateway_tool_loop_iterations", "Tool-call rounds per request", ("client",), _ITERATION_BUCKETS
+)
+LlmQueueWait = Histogram(
+    "gateway_llm_queue_wait_seconds", "Time LLM calls waited for rate limit budget", ("provider",), _LATENCY_BUCKETS
+)
+StreamDuration = Histogram("gateway_sse_stream_duration_seconds", "SSE stream lifetime", (), _STREAM_BUCKETS)
+HttpLatency = Histogram(
+    "gateway_http_request_duration_seconds", "HTTP handler latency", ("method", "route", "status"), _LATENCY_BUCKETS
+)
+InFlightRequests = Gauge("gateway_requests_in_flight", "Requests being processed", ("endpoint",))
+LlmQueuedCalls = Gauge("gateway_llm_queued_calls", "LLM calls waiting for rate limit budget", ("provider",))
+LlmRetries = Counter("gateway_llm_retries_total", "LLM calls retried after a failure", ("provider", "reason"))
+LlmHedges = Counter("gateway_llm_hedges_total", "Hedge requests sent for slow LLM calls", ("provider", "outcome"))
+LlmCacheLookups = Counter("gateway_llm_cache_lookups_total", "LLM response cache results", ("provider", "result"))
+
+_metrics = [
+    LlmLatency, LlmQueueWait, ToolLatency, RequestTokens, ToolLoopIterations, StreamDuration, HttpLatency,
+    InFlightRequests, LlmQueuedCalls, LlmRetries, LlmHedges, LlmCacheLookups
+]
+
+# Callables returning extra exposition lines, evaluated at scrape time (pool gauges and the like)
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register_collector(collector: Callable[[], List[str]]):
+    _collectors.append(collector)
+
+
+def render_samples(name: str, help_text: str, metric_type: str, samples: List[Tuple[Dict[str, Any], float]]) -> List[str]:
+    """Exposition lines for values read at scrape time, as [({label: value}, sample value)]"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return lines
+
+
+def observe_request(selected_client: str, data: Dict[str, Any]):
+    """Per-request totals from a ClientAndServerExecutionResponse.Data"""
+    if not data:
+        return
+    RequestTokens.observe(data.get("total_tokens", 0), selected_client)
+    ToolLoopIterations.observe(data.get("tool_loop_iterations", 0), selected_client)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            lines.extend(collector())
+        except Exception as err:
+            logger.warning("Error collecting metrics: %s", err)
+    return "\n".join(lines) + "\n"
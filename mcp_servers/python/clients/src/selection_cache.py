@@ -0,0 +1,59 @@
+import re
+import copy
+import hashlib
+from typing import Dict, Any, List, Optional
+
+from src.ttl_cache import TTLCache
+from src.client_and_server_config import SelectionCacheConfig
+from src.metrics import register_collector, render_samples
+
+
+# Memoized {isFunctionCall, selectedTools} results of the tool-selection LLM call.
+# The key includes the catalog hash, so a tool list change invalidates entries.
+_selection_cache = TTLCache(SelectionCacheConfig["max_entries"], SelectionCacheConfig["ttl_seconds"])
+
+SelectionCacheStats: Dict[str, int] = {
+    "hits": 0,
+    "misses": 0
+}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_input(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", (text or "").strip().lower()).rstrip(" .!?")
+
+
+def make_selection_key(input_text: str, selected_servers: List[str], catalog_hash: Optional[str]) -> str:
+    raw = "\x1f".join([normalize_input(input_text), ",".join(sorted(selected_servers)), catalog_hash or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_cached_selection(key: str) -> Optional[Dict[str, Any]]:
+    if not SelectionCacheConfig["enabled"]:
+        return None
+    selection = _selection_cache.get(key)
+    if selection is None:
+        SelectionCacheStats["misses"] += 1
+        return None
+    SelectionCacheStats["hits"] += 1
+    return copy.deepcopy(selection)
+
+
+def cache_selection(key: str, selection: Dict[str, Any]):
+    if SelectionCacheConfig["enabled"]:
+        _selection_cache.set(key, copy.deepcopy(selection))
+
+
+def clear_selection_cache():
+    _selection_cache.clear()
+
+
+def _collect_selection_cache_metrics() -> List[str]:
+    return render_samples(
+        "gateway_tool_selection_cache_lookups_total", "Tool-selection cache lookups", "counter",
+        [({"result": "hit"}, SelectionCacheStats["hits"]), ({"result": "miss"}, SelectionCacheStats["misses"])]
+    )
+
+
+register_collector(_collect_selection_cache_metrics)
@@ -1,65 +1,418 @@
 import os
+import math
+import time
 import asyncio
 import warnings
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set, Tuple
 
+import anyio
 from contextlib import AsyncExitStack
-from src.client_and_server_config import ServersConfig
-from mcp import ClientSession, StdioServerParameters
+from src.client_and_server_config import ServersConfig, ServerStartupConfig, ServerSupervisorConfig, ToolExecutionConfig
+from src.tool_catalog import update_server_tools, get_catalog_summary
+from src.selection_cache import clear_selection_cache
+from src.session_pool import MCPSessionPool, RequestIdRecorder
+from src.metrics import register_collector, render_samples
+from src.structured_logging import get_logger
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
-from mcp import ClientSession, StdioServerParameters
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
 
 # Suppress warnings about unclosed transports
 warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed transport .*")
 
+# Global session store: servers with at least one live session
+MCPServers: Dict[str, MCPSessionPool] = {}
 
-# Suppress specific ResourceWarning related to unclosed transport
-warnings.filterwarnings("ignore", category=ResourceWarning, message="unclosed transport .*")
+# Every configured server's pool, live or not
+_pools: Dict[str, MCPSessionPool] = {}
 
-# Global session store
-MCPServers: Dict[str, ClientSession] = {}
+# Per-server startup state, reported by /health
+MCPServersStatus: Dict[str, Dict[str, Any]] = {}
 
+# Background tasks owning each pooled session's stdio transport, keyed by "<server>#<slot>"
+_server_tasks: Dict[str, asyncio.Task] = {}
+_shutdown_event: Optional[asyncio.Event] = None
 
-async def initialize_all_mcp(exit_stack):
-    """Initialize all MCP clients based on server configuration"""
-    for server in ServersConfig:
+# Catalog refreshes scheduled by tools/list_changed notifications, held until they finish
+_refresh_tasks: Set[asyncio.Task] = set()
+
+logger = get_logger("mcp")
+
+# Errors from a session whose child process or stdio pipes are gone
+_TRANSPORT_CLOSED = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
+
+def _update_status(server_name: str, **fields):
+    status = MCPServersStatus.setdefault(server_name, {
+        "ready": False,
+        "status": "pending",
+        "attempts": 0,
+        "startup_time": None,
+        "last_attempt_time": None,
+        "error": None,
+        "tools": [],
+        "failures": 0,
+        "restarts": 0,
+        "last_failure_at": None,
+        "last_recovery_time": None,
+        "sessions": []
+    })
+    status.update(fields)
+
+
+def _update_session_status(server_name: str, slot: int, **fields):
+    """Record startup state for one pool slot and re-derive the server's totals from all slots.
+
+    attempts is summed over the slots, startup_time is the slowest ready
+    slot's (the time until the whole pool was up), last_attempt_time the
+    longest latest attempt and error the first failing slot's.
+    """
+    sessions = MCPServersStatus[server_name]["sessions"]
+    sessions[slot].update(fields)
+    startup_times = [session["startup_time"] for session in sessions if session["startup_time"] is not None]
+    attempt_times = [session["last_attempt_time"] for session in sessions if session["last_attempt_time"] is not None]
+    errors = [session["error"] for session in sessions if session["error"] is not None]
+    _update_status(
+        server_name,
+        attempts=sum(session["attempts"] for session in sessions),
+        startup_time=max(startup_times) if startup_times else None,
+        last_attempt_time=max(attempt_times) if attempt_times else None,
+        error=errors[0] if errors else None
+    )
+
+
+async def _start_session(server: Dict[str, Any], exit_stack: AsyncExitStack) -> ClientSession:
+    """Spawn the server process, run the MCP handshake and confirm the tool list"""
+    # Optional directory existence check
+    if "--directory" in server["args"]:
+        dir_index = server["args"].index("--directory")
+        if dir_index + 1 < len(server["args"]):
+            absolute_path = os.path.abspath(server["args"][dir_index + 1])
+            if not os.path.exists(absolute_path):
+                logger.warning("%s directory %s does not exist", server["server_name"], absolute_path)
+
+    # Start stdio client
+    server_params = StdioServerParameters(command=server["command"], args=server["args"])
+    stdio, write = await exit_stack.enter_async_context(stdio_client(server_params))
+
+    session = await exit_stack.enter_async_context(
+        ClientSession(stdio, RequestIdRecorder(write), message_handler=_make_message_handler(server["server_name"]))
+    )
+    await session.initialize()
+
+    # Confirm connection and build the tool catalog entry
+    tools_response = await session.list_tools()
+    _store_tools(server["server_name"], tools_response.tools)
+    _update_status(server["server_name"], tools=[tool.name for tool in tools_response.tools])
+    return session
+
+
+def _store_tools(server_name: str, mcp_tools: List[Any]) -> bool:
+    """Update the server's catalog entry; cached tool selections are dropped when it changed"""
+    changed = update_server_tools(server_name, mcp_tools)
+    if changed:
+        # Their keys hold the old catalog hash, so they could never be hit again
+        clear_selection_cache()
+    return changed
+
+
+def _refresh_done(task: asyncio.Task):
+    _refresh_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Tool catalog refresh failed: %s", task.exception())
+
+
+def _make_message_handler(server_name: str):
+    async def message_handler(message):
+        # The handler runs inside the session's receive loop, so the refresh
+        # (which needs that loop to read the list_tools response) is scheduled
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            logger.info("Tool list changed on %s, refreshing catalog", server_name)
+            task = asyncio.create_task(refresh_tool_catalog(server_name))
+            _refresh_tasks.add(task)
+            task.add_done_callback(_refresh_done)
+    return message_handler
+
+
+async def refresh_tool_catalog(server_name: Optional[str] = None) -> Dict[str, Any]:
+    """Re-read tool lists from one server, or from every connected server"""
+    server_names = [server_name] if server_name else list(MCPServers.keys())
+    for name in server_names:
+        session = MCPServers.get(name)
+        if session is None:
+            continue
         try:
-            print(f"\n================= Initializing {server['server_name']} mcp server start ===============")
-            print(f"Server name        : {server['server_name']}")
-            print(f"Server command     : {server['command']}")
-            print(f"Server args        : {server['args']}")
-            print(f"cwd                : {os.getcwd()}")
-
-            # Optional directory existence check
-            if "--directory" in server["args"]:
-                dir_index = server["args"].index("--directory")
-                if dir_index + 1 < len(server["args"]):
-                    relative_path = server["args"][dir_index + 1]
-                    absolute_path = os.path.abspath(relative_path)
-                    print(f"Relative path      : {relative_path}")
-                    print(f"Absolute path      : {absolute_path}")
-                    print(f"Path exists        : {os.path.exists(absolute_path)}")
-
-            # Start stdio client
-            server_params = StdioServerParameters(command=server["command"], args=server["args"])
-            stdio_transport = await exit_stack.enter_async_context(stdio_client(server_params))
-            stdio, write = stdio_transport
-
-            session = await exit_stack.enter_async_context(ClientSession(stdio, write))
-            await session.initialize()
-
-
-            # Save session globally
-            MCPServers[server["server_name"]] = session
-
-            # Confirm connection
             tools_response = await session.list_tools()
-            tool_names = [tool.name for tool in tools_response.tools]
-            print(f"Connected to {server['server_name']} with tools: {tool_names}")
-            print(f"\n================= Initializing {server['server_name']} mcp server end ===============")
+            if _store_tools(name, tools_response.tools):
+                logger.info("Tool catalog for %s updated", name)
+            _update_status(name, tools=[tool.name for tool in tools_response.tools])
+        except Exception as err:
+            logger.warning("Error refreshing tool catalog for %s: %s", name, err)
+    return get_catalog_summary()
 
+
+def _drop_session(server_name: str, slot: int):
+    pool = _pools[server_name]
+    pool.remove_session(slot)
+    _update_session_status(server_name, slot, status="stopped")
+    if not len(pool):
+        MCPServers.pop(server_name, None)
+
+
+async def _watch_session(session: ClientSession) -> Tuple[Optional[str], Optional[float]]:
+    """Ping a live session until shutdown or until it fails.
+
+    Returns (None, None) on shutdown, otherwise why the session failed and
+    the perf_counter time of the first failed ping. Only ping timeouts count
+    toward max_missed_pings; a closed transport or any other error fails at once.
+    """
+    missed = 0
+    first_failed_at: Optional[float] = None
+    while True:
+        try:
+            await asyncio.wait_for(_shutdown_event.wait(), timeout=ServerSupervisorConfig["ping_interval"])
+            return None, None
+        except asyncio.TimeoutError:
+            pass
+
+        ping_started_at = time.perf_counter()
+        try:
+            with anyio.fail_after(ServerSupervisorConfig["ping_timeout"]):
+                await session.send_ping()
+            missed = 0
+            first_failed_at = None
+        except TimeoutError:
+            missed += 1
+            if first_failed_at is None:
+                first_failed_at = ping_started_at
+            if missed >= ServerSupervisorConfig["max_missed_pings"]:
+                return f"health check failed after {missed} missed pings", first_failed_at
+        except _TRANSPORT_CLOSED as err:
+            return f"transport closed ({type(err).__name__})", first_failed_at or ping_started_at
+        except McpError as err:
+            if err.error.code == CONNECTION_CLOSED:
+                return "transport closed (connection closed)", first_failed_at or ping_started_at
+            return f"health check failed: {err}", first_failed_at or ping_started_at
         except Exception as err:
-            print(f"Error initializing {server['server_name']} mcp server =========>>>> {err}")
-            continue
+            return f"health check failed: {str(err) or type(err).__name__}", first_failed_at or ping_started_at
+
+
+async def _run_server(server: Dict[str, Any], slot: int, first_attempt_done: asyncio.Event):
+    """Keep one pooled session of an MCP server connected for the lifetime of the gateway.
+
+    The transport and session are entered and exited inside this task, as the
+    anyio task groups behind stdio_client require. Attempts that fail or miss
+    the startup deadline are retried with exponential backoff. Once up, the
+    session is pinged; if it stops answering or its transport dies, the child
+    process is torn down and a new session takes over the same pool slot.
+    """
+    server_name = server["server_name"]
+    pool = _pools[server_name]
+    startup_timeout = server.get("startup_timeout", ServerStartupConfig["startup_timeout"])
+    retry_delay = ServerStartupConfig["retry_initial_delay"]
+    attempts = 0
+    failed_at: Optional[float] = None
+
+    while not _shutdown_event.is_set():
+        attempts += 1
+        _update_session_status(server_name, slot, status="starting", attempts=attempts)
+        if not len(pool):
+            _update_status(server_name, status="starting")
+        started_at = time.perf_counter()
+        was_live = False
+        first_failed_at = None
+        error: Optional[str] = None
+        try:
+            # The deadline only covers startup; it is lifted once the session is up
+            with anyio.CancelScope(deadline=anyio.current_time() + startup_timeout) as startup_scope:
+                async with AsyncExitStack() as exit_stack:
+                    session = await _start_session(server, exit_stack)
+                    startup_scope.deadline = math.inf
+
+                    elapsed = time.perf_counter() - started_at
+                    pool.add_session(slot, session)
+                    MCPServers[server_name] = pool
+                    was_live = True
+                    _update_session_status(
+                        server_name, slot, status="ready", startup_time=round(elapsed, 3), last_attempt_time=round(elapsed, 3), error=None
+                    )
+                    _update_status(server_name, ready=True, status="ready")
+                    if failed_at is not None:
+                        recovery_time = round(time.perf_counter() - failed_at, 3)
+                        _update_status(
+                            server_name,
+                            restarts=MCPServersStatus[server_name]["restarts"] + 1,
+                            last_recovery_time=recovery_time
+                        )
+                        logger.info("Restarted %s (session %d/%d), recovered in %.2fs", server_name, slot + 1, pool.size, recovery_time)
+                        failed_at = None
+                    logger.info(
+                        "Connected to %s (session %d/%d) in %.2fs", server_name, slot + 1, pool.size, elapsed,
+                        extra={"tools": MCPServersStatus[server_name]["tools"]}
+                    )
+                    first_attempt_done.set()
+                    live_since = time.perf_counter()
+
+                    error, first_failed_at = await _watch_session(session)
+                    _drop_session(server_name, slot)
+                    if error is None:
+                        if not len(pool):
+                            _update_status(server_name, ready=False, status="stopped")
+                        return
+
+            if not was_live:
+                error = f"startup timed out after {startup_timeout}s"
+
+        except asyncio.CancelledError:
+            _drop_session(server_name, slot)
+            raise
+        except Exception as err:
+            # Errors raised inside the transport task groups arrive wrapped in an ExceptionGroup
+            while getattr(err, "exceptions", None):
+                err = err.exceptions[0]
+            error = str(err) or type(err).__name__
+
+        _drop_session(server_name, slot)
+        current_task = asyncio.current_task()
+        if current_task is not None and current_task.cancelling():
+            # This task was cancelled and the transport's scopes swallowed it on the way out
+            raise asyncio.CancelledError()
+        if error is None:
+            error = "session closed unexpectedly"
+        if _shutdown_event.is_set():
+            # Transport errors while closing down are not failures
+            if not len(pool):
+                _update_status(server_name, ready=False, status="stopped")
+            return
+        # The server stays ready while other sessions in its pool are live
+        if not len(pool):
+            _update_status(server_name, ready=False, status="retrying")
+        _update_session_status(
+            server_name, slot, status="retrying", startup_time=None, last_attempt_time=round(time.perf_counter() - started_at, 3), error=error
+        )
+        first_attempt_done.set()
+
+        if was_live:
+            # Recovery is measured from the first failed ping, not from when the failure was confirmed
+            failed_at = first_failed_at or time.perf_counter()
+            _update_status(server_name, failures=MCPServersStatus[server_name]["failures"] + 1, last_failure_at=time.time())
+            logger.error("%s mcp server session %d/%d failed: %s", server_name, slot + 1, pool.size, error)
+            # A session that had been stable is restarted right away; one that
+            # keeps dying soon after startup backs off like a failed startup
+            if failed_at - live_since >= ServerSupervisorConfig["ping_interval"]:
+                retry_delay = ServerStartupConfig["retry_initial_delay"]
+                continue
+
+        logger.warning(
+            "Error initializing %s mcp server session %d/%d (attempt %d): %s", server_name, slot + 1, pool.size, attempts, error
+        )
+        try:
+            await asyncio.wait_for(_shutdown_event.wait(), timeout=retry_delay)
+        except asyncio.TimeoutError:
+            pass
+        retry_delay = min(retry_delay * 2, ServerStartupConfig["retry_max_delay"])
+
+
+async def initialize_all_mcp(exit_stack):
+    """Initialize all MCP clients based on server configuration.
+
+    Servers are started concurrently and each one gets its own startup deadline.
+    A server with "pool_size" K in ServersConfig gets K sessions, each in its
+    own process. This returns once every session is either ready or has
+    missed its first deadline; those that missed it keep retrying in the
+    background.
+    """
+    global _shutdown_event
+    _shutdown_event = asyncio.Event()
+    exit_stack.push_async_callback(shutdown_all_mcp)
+
+    first_attempts: List[asyncio.Event] = []
+    for server in ServersConfig:
+        server_name = server["server_name"]
+        pool_size = max(int(server.get("pool_size", ToolExecutionConfig["default_pool_size"])), 1)
+        max_concurrent = server.get("max_concurrent_tool_calls", ToolExecutionConfig["max_concurrent_tool_calls_per_server"])
+        logger.info(
+            "Initializing %s mcp server (%d session(s)): %s %s", server_name, pool_size, server["command"], " ".join(server["args"])
+        )
+        _update_status(server_name, sessions=[
+            {"status": "pending", "attempts": 0, "startup_time": None, "last_attempt_time": None, "error": None}
+            for _ in range(pool_size)
+        ])
+        _pools[server_name] = MCPSessionPool(server_name, pool_size, max_concurrent)
+        for slot in range(pool_size):
+            first_attempt_done = asyncio.Event()
+            first_attempts.append(first_attempt_done)
+            _server_tasks[f"{server_name}#{slot}"] = asyncio.create_task(_run_server(server, slot, first_attempt_done))
+
+    await asyncio.gather(*(event.wait() for event in first_attempts))
+
+    ready = [name for name, status in MCPServersStatus.items() if status["ready"]]
+    pending = [name for name, status in MCPServersStatus.items() if not status["ready"]]
+    logger.info("MCP servers ready", extra={"servers": ready})
+    if pending:
+        logger.warning("MCP servers still retrying in background", extra={"servers": pending})
+
+    return True
+
+
+async def shutdown_all_mcp():
+    """Signal every server task to close its session and wait for them to exit"""
+    if _shutdown_event is not None:
+        _shutdown_event.set()
+    for task in list(_refresh_tasks):
+        task.cancel()
+    tasks = list(_server_tasks.values())
+    _server_tasks.clear()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Per-server session pool utilization and queue depth"""
+    return {name: pool.get_stats() for name, pool in _pools.items()}
+
+
+def get_servers_health() -> Dict[str, Any]:
+    """Snapshot of per-server readiness, startup timings and pool state"""
+    all_ready = bool(MCPServersStatus) and all(
+        status["ready"] and len(_pools[name]) == _pools[name].size if name in _pools else status["ready"]
+        for name, status in MCPServersStatus.items()
+    )
+    servers = {}
+    for name, status in MCPServersStatus.items():
+        servers[name] = dict(status)
+        if name in _pools:
+            servers[name]["pool"] = _pools[name].get_stats()
+    return {
+        "status": "ok" if all_ready else "degraded",
+        "servers": servers
+    }
+
+
+def _collect_server_metrics() -> List[str]:
+    lines: List[str] = []
+    pool_stats = get_pool_stats()
+    for key, help_text in (
+        ("live_sessions", "Live MCP sessions per server"),
+        ("in_flight", "Tool calls running per server"),
+        ("queue_depth", "Tool calls waiting for a session per server"),
+        ("utilization", "In-flight tool calls over the server's concurrency cap")
+    ):
+        lines.extend(render_samples(
+            f"gateway_mcp_pool_{key}", help_text, "gauge",
+            [({"server": name}, stats[key]) for name, stats in pool_stats.items()]
+        ))
+    for key, help_text in (("failures", "MCP sessions that died after startup"), ("restarts", "MCP sessions restarted after a failure")):
+        lines.extend(render_samples(
+            f"gateway_mcp_session_{key}_total", help_text, "counter",
+            [({"server": name}, status[key]) for name, status in MCPServersStatus.items()]
+        ))
+    lines.extend(render_samples(
+        "gateway_mcp_last_recovery_seconds", "Time from the last session failure to a ready replacement", "gauge",
+        [({"server": name}, status["last_recovery_time"]) for name, status in MCPServersStatus.items() if status["last_recovery_time"] is not None]
+    ))
+    return lines
+
 
-    return True
\ No newline at end of file
+register_collector(_collect_server_metrics)
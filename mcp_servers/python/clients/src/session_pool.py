@@ -0,0 +1,147 @@
+import time
+import asyncio
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+from mcp import ClientSession, types
+
+from src.structured_logging import get_logger
+
+logger = get_logger("mcp")
+
+# JSON-RPC ids of the requests the current task has sent, when it is collecting them
+_sent_request_ids: ContextVar[Optional[List[Any]]] = ContextVar("sent_request_ids", default=None)
+
+
+class RequestIdRecorder:
+    """Write stream for ClientSession that notes the id of each request a task sends.
+
+    ClientSession sends a request from the calling task, so call_tool can
+    learn its request id (for notifications/cancelled) from the outgoing
+    message rather than from the session's internal counter.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def send(self, message):
+        request_ids = _sent_request_ids.get()
+        root = getattr(getattr(message, "message", None), "root", None)
+        if request_ids is not None and isinstance(root, types.JSONRPCRequest):
+            request_ids.append(root.id)
+        await self._stream.send(message)
+
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+async def _send_cancelled(session: ClientSession, request_id: int):
+    try:
+        await session.send_notification(types.ClientNotification(types.CancelledNotification(
+            params=types.CancelledNotificationParams(requestId=request_id, reason="Request cancelled by gateway")
+        )))
+    except Exception as err:
+        logger.warning("Error sending cancellation for request %s: %s", request_id, err)
+
+
+class MCPSessionPool:
+    """K stdio sessions to one MCP server, each in its own child process.
+
+    Stands in for a single ClientSession in MCPServers: call_tool goes to the
+    live session with the fewest calls in flight, so one slow blocking call
+    only holds up its own process. max_concurrent caps calls across the whole
+    pool; callers beyond it wait, which is reported as queue depth.
+    """
+
+    def __init__(self, server_name: str, size: int, max_concurrent: int):
+        self.server_name = server_name
+        self.size = size
+        self.max_concurrent = max_concurrent
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        # slot index -> {"session", "in_flight", "calls"}
+        self._slots: Dict[int, Dict[str, Any]] = {}
+        self.waiting = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add_session(self, slot: int, session: ClientSession):
+        self._slots[slot] = {"session": session, "in_flight": 0, "calls": 0}
+
+    def remove_session(self, slot: int):
+        self._slots.pop(slot, None)
+
+    def _least_loaded(self) -> Dict[str, Any]:
+        if not self._slots:
+            raise RuntimeError(f"No live sessions for MCP server {self.server_name}")
+        return min(self._slots.values(), key=lambda entry: entry["in_flight"])
+
+    async def call_tool(
+        self,
+        name: str,
+        arguments: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        meta: Optional[Dict[str, Any]] = None
+    ):
+        """Run a tool on the least-busy session, waiting at most `timeout` seconds in total.
+
+        When the call is cancelled or times out, the server is sent a
+        notifications/cancelled for the request so it can stop the work.
+        """
+        started_at = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        finally:
+            self.waiting -= 1
+
+        try:
+            entry = self._least_loaded()
+            session = entry["session"]
+            request_ids = []
+
+            async def send():
+                # Filled in by RequestIdRecorder as the tools/call request goes out
+                _sent_request_ids.set(request_ids)
+                if meta:
+                    return await session.call_tool(name, arguments, meta=meta)
+                return await session.call_tool(name, arguments)
+
+            entry["in_flight"] += 1
+            entry["calls"] += 1
+            try:
+                remaining = None if timeout is None else max(timeout - (time.monotonic() - started_at), 0)
+                return await asyncio.wait_for(send(), remaining)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                if request_ids:
+                    await asyncio.shield(_send_cancelled(session, request_ids[0]))
+                raise
+            finally:
+                entry["in_flight"] -= 1
+        finally:
+            self._semaphore.release()
+
+    async def list_tools(self):
+        return await self._least_loaded()["session"].list_tools()
+
+    def get_stats(self) -> Dict[str, Any]:
+        in_flight = sum(entry["in_flight"] for entry in self._slots.values())
+        return {
+            "size": self.size,
+            "live_sessions": len(self._slots),
+            "in_flight": in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "utilization": round(in_flight / self.max_concurrent, 4) if self.max_concurrent else 0.0,
+            "sessions": {
+                slot: {"in_flight": entry["in_flight"], "calls": entry["calls"]}
+                for slot, entry in sorted(self._slots.items())
+            }
+        }
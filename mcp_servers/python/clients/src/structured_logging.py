@@ -0,0 +1,131 @@
+import re
+import sys
+import time
+import queue
+import random
+import logging
+import logging.handlers
+from typing import Dict, Any, Optional
+
+from src.json_codec import dumps
+from src.client_and_server_config import LoggingConfig
+
+
+# Structured logging for the gateway. Log calls only enqueue the record;
+# formatting, redaction of extra fields and the stdout write happen on the
+# QueueListener's background thread. Components log under "gateway.<name>"
+# with levels set per component in LoggingConfig.
+
+_SECRET_KEY_RE = re.compile(
+    r"(api[_-]?key|apikey|token|secret|password|passwd|authorization|credential|private[_-]?key|cookie|session[_-]?id)",
+    re.I
+)
+_REDACTED = "[REDACTED]"
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+DroppedLogRecords = 0
+
+
+def redact(value: Any, max_chars: Optional[int] = None, _depth: int = 0) -> Any:
+    """Copy of `value` with secret-looking keys masked and long strings and lists cut"""
+    max_chars = max_chars or LoggingConfig["max_field_chars"]
+    if _depth > 8:
+        return "..."
+    if isinstance(value, dict):
+        return {
+            key: _REDACTED if isinstance(key, str) and _SECRET_KEY_RE.search(key) else redact(item, max_chars, _depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        max_items = LoggingConfig["max_list_items"]
+        items = [redact(item, max_chars, _depth + 1) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"... {len(value) - max_items} more items")
+        return items
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}... [{len(value) - max_chars} chars truncated]"
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return redact(str(value), max_chars, _depth + 1)
+
+
+def should_log_payload() -> bool:
+    """Payload dumps are sampled; at the default rate of 0 they are never built"""
+    rate = LoggingConfig["payload_sample_rate"]
+    return rate > 0 and random.random() < rate
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        global DroppedLogRecords
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppedLogRecords += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = _REDACTED if _SECRET_KEY_RE.search(key) else redact(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s - %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = {key: value for key, value in record.__dict__.items() if key not in _RECORD_FIELDS}
+        if extra:
+            line += " " + dumps(redact(extra))
+        return line
+
+
+def setup_logging():
+    """Route all logging through the background queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(LoggingConfig["queue_size"])
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LoggingConfig["format"] == "json" else TextFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [_NonBlockingQueueHandler(log_queue)]
+    root.setLevel(LoggingConfig["level"])
+    for component, level in LoggingConfig["components"].items():
+        logging.getLogger(f"gateway.{component}").setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(component: str) -> logging.Logger:
+    return logging.getLogger(f"gateway.{component}")
@@ -0,0 +1,130 @@
+import re
+import json
+import time
+import hashlib
+from typing import Dict, Any, List, Set, Tuple
+
+
+# Gateway-side tool catalog, one entry per MCP server:
+#   {"tools": [openai-style function schemas], "hash": str, "version": int, "updated_at": float}
+ToolCatalog: Dict[str, Dict[str, Any]] = {}
+
+
+def build_tool_schema(tool: Any) -> Dict[str, Any]:
+    """Convert an MCP Tool into the OpenAI-style function schema sent to the LLMs"""
+    return {
+        "type": "function",
+        "function": {
+            "name": tool.name,
+            "description": getattr(tool, "description", f"Tool for {tool.name}"),
+            "parameters": getattr(tool, "inputSchema", {
+                "type": "object",
+                "properties": {},
+                "required": []
+            })
+        }
+    }
+
+
+def _hash_tools(tools: List[Dict[str, Any]]) -> str:
+    encoded = json.dumps(tools, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def update_server_tools(server_name: str, mcp_tools: List[Any]) -> bool:
+    """Store the prebuilt schemas for a server. Returns True when its content changed."""
+    tools = [build_tool_schema(tool) for tool in mcp_tools]
+    content_hash = _hash_tools(tools)
+
+    entry = ToolCatalog.get(server_name)
+    if entry and entry["hash"] == content_hash:
+        return False
+
+    ToolCatalog[server_name] = {
+        "tools": tools,
+        "hash": content_hash,
+        "version": entry["version"] + 1 if entry else 1,
+        "updated_at": time.time()
+    }
+    return True
+
+
+def get_server_tools(server_name: str) -> List[Dict[str, Any]]:
+    entry = ToolCatalog.get(server_name)
+    return entry["tools"] if entry else []
+
+
+def get_catalog_hash(server_names: List[str]) -> str:
+    """Combined content hash for a set of servers, stable under reordering"""
+    parts = [f"{name}:{ToolCatalog[name]['hash']}" for name in sorted(server_names) if name in ToolCatalog]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+# (server names, catalog hash) -> (tools, routes); rebuilt when any catalog changes
+_routing_cache: Dict[Any, Any] = {}
+_ROUTING_CACHE_SIZE = 64
+
+
+def _namespaced_name(server_name: str, tool_name: str, taken: Set[str]) -> str:
+    # OpenAI function names must match ^[a-zA-Z0-9_-]{1,64}$
+    name = re.sub(r"[^a-zA-Z0-9_-]", "_", f"{server_name}__{tool_name}")[:64]
+    attempt = 0
+    while name in taken:
+        # Cut or sanitized names can meet each other or a unique tool name; a digest of the pair tells them apart
+        digest = hashlib.sha256(f"{server_name}/{tool_name}/{attempt}".encode("utf-8")).hexdigest()[:8]
+        name = f"{name[:55]}_{digest}"
+        attempt += 1
+    return name
+
+
+def build_tool_routing(server_names: List[str]) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, str]]]:
+    """Tool schemas for a set of servers plus the routing table for their calls.
+
+    Returns (tools, routes) where routes maps each exposed tool name to
+    {"server", "tool"}. Names offered by more than one server are exposed
+    as "<server>__<tool>" on every server that has them, with a short hash
+    suffix when that name is already taken; unique names are left unchanged.
+    """
+    cache_key = (tuple(server_names), get_catalog_hash(server_names))
+    cached = _routing_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    owners: Dict[str, int] = {}
+    for server_name in server_names:
+        for tool in get_server_tools(server_name):
+            tool_name = tool["function"]["name"]
+            owners[tool_name] = owners.get(tool_name, 0) + 1
+
+    tools: List[Dict[str, Any]] = []
+    routes: Dict[str, Dict[str, str]] = {}
+    # Unique names are exposed as is, so namespaced names must steer clear of them
+    taken = {tool_name for tool_name, count in owners.items() if count == 1}
+    for server_name in server_names:
+        for tool in get_server_tools(server_name):
+            tool_name = tool["function"]["name"]
+            if owners[tool_name] > 1:
+                exposed_name = _namespaced_name(server_name, tool_name, taken)
+                taken.add(exposed_name)
+                tool = {**tool, "function": {**tool["function"], "name": exposed_name}}
+            else:
+                exposed_name = tool_name
+            tools.append(tool)
+            routes[exposed_name] = {"server": server_name, "tool": tool_name}
+
+    if len(_routing_cache) >= _ROUTING_CACHE_SIZE:
+        _routing_cache.clear()
+    _routing_cache[cache_key] = (tools, routes)
+    return tools, routes
+
+
+def get_catalog_summary() -> Dict[str, Any]:
+    return {
+        name: {
+            "version": entry["version"],
+            "hash": entry["hash"],
+            "tool_count": len(entry["tools"]),
+            "updated_at": entry["updated_at"]
+        }
+        for name, entry in ToolCatalog.items()
+    }
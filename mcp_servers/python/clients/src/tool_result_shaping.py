@@ -0,0 +1,84 @@
+from typing import Dict, Any, Tuple
+
+from src.chat_history import count_tokens
+from src.json_codec import dumps, loads
+from src.client_and_server_config import ToolResultBudgetConfig, ServersConfig
+
+
+_BUDGET_KEYS = ("max_bytes", "max_tokens", "array_head", "array_tail", "max_string_chars")
+_MAX_PASSES = 4
+
+
+def get_tool_result_budget(selected_server: str, tool_name: str) -> Dict[str, int]:
+    """Global budget, then the server's "tool_result_budget", then per-tool overrides"""
+    budget = {key: ToolResultBudgetConfig[key] for key in _BUDGET_KEYS}
+    server_config = next((s for s in ServersConfig if s["server_name"] == selected_server), {})
+    server_budget = server_config.get("tool_result_budget", {})
+    budget.update({key: value for key, value in server_budget.items() if key in _BUDGET_KEYS})
+    budget.update(ToolResultBudgetConfig["per_tool"].get(tool_name, {}))
+    budget.update(server_budget.get("per_tool", {}).get(tool_name, {}))
+    return budget
+
+
+def _shape_string(value: str, head: int, tail: int, max_chars: int) -> str:
+    # MCP text content is often a JSON document; shape its structure rather than cutting it blindly
+    if len(value) > max_chars and value[:1] in ("{", "["):
+        try:
+            parsed = loads(value)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, (dict, list)):
+            return dumps(_shape_value(parsed, head, tail, max_chars))
+
+    if len(value) > max_chars:
+        return f"{value[:max_chars]}... [truncated, {len(value) - max_chars} chars omitted]"
+    return value
+
+
+def _shape_value(value: Any, head: int, tail: int, max_chars: int) -> Any:
+    if isinstance(value, str):
+        return _shape_string(value, head, tail, max_chars)
+    if isinstance(value, dict):
+        return {key: _shape_value(item, head, tail, max_chars) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) > head + tail:
+            omitted = len(value) - head - tail
+            value = value[:head] + [f"... truncated, {omitted} items omitted ..."] + (value[-tail:] if tail else [])
+        return [_shape_value(item, head, tail, max_chars) for item in value]
+    return value
+
+
+def _fits(encoded: str, budget: Dict[str, int]) -> bool:
+    return len(encoded.encode("utf-8")) <= budget["max_bytes"] and count_tokens(encoded) <= budget["max_tokens"]
+
+
+def shape_tool_result(selected_server: str, tool_name: str, tool_call_result: Any) -> Tuple[str, Dict[str, Any]]:
+    """JSON text of a tool result bounded for the LLM context.
+
+    Arrays keep their head and tail and long strings are cut, each with a
+    "truncated" marker. Limits are halved on each pass until the result fits
+    the byte and token budget; as a last resort the text is cut outright.
+    Returns the text and {"truncated", "original_bytes", "bytes"}.
+    """
+    encoded = dumps(tool_call_result)
+    original_bytes = len(encoded.encode("utf-8"))
+    if not ToolResultBudgetConfig["enabled"]:
+        return encoded, {"truncated": False, "original_bytes": original_bytes, "bytes": original_bytes}
+
+    budget = get_tool_result_budget(selected_server, tool_name)
+    if _fits(encoded, budget):
+        return encoded, {"truncated": False, "original_bytes": original_bytes, "bytes": original_bytes}
+
+    head, tail, max_chars = budget["array_head"], budget["array_tail"], budget["max_string_chars"]
+    for _ in range(_MAX_PASSES):
+        encoded = dumps(_shape_value(tool_call_result, head, tail, max_chars))
+        if _fits(encoded, budget):
+            break
+        head, tail, max_chars = max(head // 2, 1), tail // 2, max(max_chars // 2, 64)
+    else:
+        # A token is never shorter than one byte, so this cut fits both limits
+        limit = max(min(budget["max_bytes"], budget["max_tokens"]) - 64, 0)
+        kept = encoded.encode("utf-8")[:limit].decode("utf-8", errors="ignore")
+        encoded = f"{kept}... [truncated, {original_bytes - limit} bytes omitted]"
+
+    return encoded, {"truncated": True, "original_bytes": original_bytes, "bytes": len(encoded.encode("utf-8"))}
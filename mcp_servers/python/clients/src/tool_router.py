@@ -0,0 +1,145 @@
+import re
+import math
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional
+
+from src.client_and_server_config import ToolRouterConfig
+from src.metrics import register_collector, render_samples
+
+
+# Routing decisions since startup; hit rate is the share that skipped the router LLM call
+RouterMetrics: Dict[str, int] = {
+    "all_tools": 0,
+    "local": 0,
+    "llm": 0
+}
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "from", "at", "is",
+    "are", "be", "it", "this", "that", "me", "my", "i", "you", "your", "please", "can", "could",
+    "would", "should", "will", "do", "does", "get", "all", "any", "some", "what", "which", "who"
+}
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+_CAMEL_RE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for word in _TOKEN_RE.findall(_CAMEL_RE.sub(" ", text or "")):
+        word = word.lower()
+        if word not in _STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over tool names, descriptions and parameter names"""
+
+    def __init__(self, tools: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.names: List[str] = []
+        self.doc_freqs: List[Counter] = []
+        self.doc_lens: List[int] = []
+
+        for tool in tools:
+            function = tool.get("function", {})
+            name = function.get("name", "")
+            parameters = (function.get("parameters") or {}).get("properties") or {}
+            # The tool name is weighted twice: it is the most specific signal
+            text = " ".join([name, name, function.get("description") or "", " ".join(parameters.keys())])
+            tokens = tokenize(text)
+            self.names.append(name)
+            self.doc_freqs.append(Counter(tokens))
+            self.doc_lens.append(len(tokens))
+
+        self.avg_doc_len = (sum(self.doc_lens) / len(self.doc_lens)) if self.doc_lens else 0.0
+        doc_count = Counter()
+        for freqs in self.doc_freqs:
+            doc_count.update(freqs.keys())
+        total = len(self.doc_freqs)
+        self.idf = {term: math.log(1 + (total - n + 0.5) / (n + 0.5)) for term, n in doc_count.items()}
+
+    def score(self, query: str) -> List[float]:
+        query_terms = tokenize(query)
+        scores = []
+        for freqs, doc_len in zip(self.doc_freqs, self.doc_lens):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * doc_len / self.avg_doc_len) if self.avg_doc_len else self.k1
+            for term in query_terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+
+# Indexes are rebuilt only when the catalog hash changes
+_index_cache: "OrderedDict[str, BM25Index]" = OrderedDict()
+_INDEX_CACHE_SIZE = 32
+
+
+def _get_index(tools: List[Dict[str, Any]], catalog_hash: Optional[str]) -> BM25Index:
+    if not catalog_hash:
+        return BM25Index(tools)
+    index = _index_cache.get(catalog_hash)
+    if index is None:
+        index = BM25Index(tools)
+        _index_cache[catalog_hash] = index
+        if len(_index_cache) > _INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    else:
+        _index_cache.move_to_end(catalog_hash)
+    return index
+
+
+def route_tools(input_text: str, tools: List[Dict[str, Any]], catalog_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Decide locally which tools the main LLM call gets.
+
+    Returns {"decision", "selected_tools", "confidence"} where decision is
+    "all_tools" (small catalog, every tool is sent), "local" (confident BM25
+    match) or "llm" (fall back to the tool-selection LLM call).
+    """
+    tool_names = [tool.get("function", {}).get("name", "") for tool in tools]
+
+    if not ToolRouterConfig["enabled"] or not tools:
+        decision = {"decision": "llm", "selected_tools": [], "confidence": 0.0}
+    elif len(tools) <= ToolRouterConfig["small_catalog_size"]:
+        decision = {"decision": "all_tools", "selected_tools": tool_names, "confidence": 1.0}
+    else:
+        scores = _get_index(tools, catalog_hash).score(input_text)
+        ranked = sorted(zip(tool_names, scores), key=lambda item: item[1], reverse=True)
+        top_score = ranked[0][1]
+        second_score = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = top_score / (top_score + second_score) if top_score > 0 else 0.0
+
+        if top_score >= ToolRouterConfig["min_score"] and confidence >= ToolRouterConfig["min_confidence"]:
+            threshold = top_score * ToolRouterConfig["select_ratio"]
+            selected = [name for name, score in ranked if score >= threshold][:ToolRouterConfig["max_selected_tools"]]
+            decision = {"decision": "local", "selected_tools": selected, "confidence": round(confidence, 3)}
+        else:
+            decision = {"decision": "llm", "selected_tools": [], "confidence": round(confidence, 3)}
+
+    RouterMetrics[decision["decision"]] += 1
+    return decision
+
+
+def get_router_metrics() -> Dict[str, Any]:
+    total = sum(RouterMetrics.values())
+    skipped = RouterMetrics["all_tools"] + RouterMetrics["local"]
+    return {
+        "decisions": dict(RouterMetrics),
+        "total": total,
+        "hit_rate": round(skipped / total, 4) if total else 0.0
+    }
+
+
+def _collect_router_metrics() -> List[str]:
+    return render_samples(
+        "gateway_tool_router_decisions_total", "Tool routing decisions (all_tools and local skip the router LLM call)", "counter",
+        [({"decision": decision}, count) for decision, count in RouterMetrics.items()]
+    )
+
+
+register_collector(_collect_router_metrics)
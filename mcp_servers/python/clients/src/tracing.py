@@ -0,0 +1,158 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+from contextvars import ContextVar
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+from src.json_codec import dumps
+from src.client_and_server_config import TracingConfig
+from src.structured_logging import get_logger
+
+logger = get_logger("tracing")
+
+
+# Lightweight per-request span tracing. Every request gets a trace id; sampled
+# traces record spans and are written to TracingConfig["export_dir"] as Chrome
+# trace files (load them in chrome://tracing or Perfetto) or plain JSON.
+
+class Trace:
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "end", "attrs", "lane")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+        # Spans from concurrent tasks go on separate lanes in the Chrome view
+        try:
+            self.lane = id(asyncio.current_task())
+        except RuntimeError:
+            self.lane = 0
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def get_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def get_traceparent() -> Optional[str]:
+    """W3C traceparent for the current span, passed to MCP servers in request _meta"""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    current = _current_span.get()
+    # Unsampled traces record no spans, but the parent id must still be non-zero
+    span_id = current.span_id if current else uuid.uuid4().hex[:16]
+    return f"00-{trace.trace_id}-{span_id}-{'01' if trace.sampled else '00'}"
+
+
+@contextmanager
+def span(name: str, **attrs: Any):
+    """Record a span under the current one; a no-op outside a sampled trace"""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(trace, name, parent.span_id if parent else None, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        if len(trace.spans) < TracingConfig["max_spans_per_trace"]:
+            trace.spans.append(current)
+        else:
+            trace.dropped += 1
+
+
+def resolve_trace_id(trace_id: Optional[str] = None) -> str:
+    """The incoming trace id when it is 32 hex digits, otherwise a new one"""
+    trace_id = (trace_id or "").lower()
+    if len(trace_id) == 32 and all(c in "0123456789abcdef" for c in trace_id):
+        return trace_id
+    return uuid.uuid4().hex
+
+
+@asynccontextmanager
+async def trace_request(name: str, trace_id: Optional[str] = None, force_sample: bool = False, **attrs: Any):
+    """Root span for one request. An incoming 32-hex-digit trace id is reused."""
+    trace_id = resolve_trace_id(trace_id)
+    sampled = TracingConfig["enabled"] and (force_sample or random.random() < TracingConfig["sample_rate"])
+
+    trace = Trace(trace_id, sampled)
+    trace_token = _current_trace.set(trace)
+    try:
+        with span(name, **attrs):
+            yield trace
+    finally:
+        _current_trace.reset(trace_token)
+        if sampled:
+            try:
+                await asyncio.to_thread(_export_trace, trace)
+            except Exception as err:
+                logger.warning("Error exporting trace %s: %s", trace_id, err)
+
+
+def _to_chrome(trace: Trace) -> Dict[str, Any]:
+    origin = min(s.start for s in trace.spans)
+    lanes: Dict[int, int] = {}
+    events = []
+    for s in sorted(trace.spans, key=lambda item: item.start):
+        events.append({
+            "name": s.name,
+            "cat": s.name.split(".")[0],
+            "ph": "X",
+            "ts": round((s.start - origin) * 1e6, 1),
+            "dur": round((s.end - s.start) * 1e6, 1),
+            "pid": 1,
+            "tid": lanes.setdefault(s.lane, len(lanes) + 1),
+            "args": {"span_id": s.span_id, "parent_id": s.parent_id, **s.attrs}
+        })
+    return {"traceEvents": events, "otherData": {"trace_id": trace.trace_id, "dropped_spans": trace.dropped}}
+
+
+def _to_json(trace: Trace) -> Dict[str, Any]:
+    origin = min(s.start for s in trace.spans)
+    return {
+        "trace_id": trace.trace_id,
+        "dropped_spans": trace.dropped,
+        "spans": [{
+            "name": s.name,
+            "span_id": s.span_id,
+            "parent_id": s.parent_id,
+            "start_ms": round((s.start - origin) * 1000, 3),
+            "duration_ms": round((s.end - s.start) * 1000, 3),
+            "attributes": s.attrs
+        } for s in sorted(trace.spans, key=lambda item: item.start)]
+    }
+
+
+def _export_trace(trace: Trace):
+    if not trace.spans:
+        return
+    export_dir = TracingConfig["export_dir"]
+    os.makedirs(export_dir, exist_ok=True)
+    document = _to_chrome(trace) if TracingConfig["format"] == "chrome" else _to_json(trace)
+    with open(os.path.join(export_dir, f"{trace.trace_id}.json"), "w", encoding="utf-8") as trace_file:
+        trace_file.write(dumps(document))
@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """In-memory LRU cache whose entries also expire after `ttl` seconds.
+
+    With `max_size` and `sizeof`, least recently used entries are also
+    evicted while the entries' total size is over `max_size`. With `sliding`,
+    every get pushes the entry's expiry back, so only entries unused for
+    `ttl` seconds expire.
+    """
+
+    def __init__(
+        self, max_entries: int, ttl: float, max_size: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None, sliding: bool = False
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sliding = sliding
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.total_size = 0
+        # key -> (expires at, value, size)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, size = entry
+        now = time.monotonic()
+        if expires_at < now:
+            del self._entries[key]
+            self.total_size -= size
+            return None
+        if self.sliding:
+            self._entries[key] = (now + self.ttl, value, size)
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> bool:
+        """Store `value`; returns False (and stores nothing) when it alone is over max_size"""
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if self.max_size is not None and size > self.max_size:
+            return False
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.total_size -= previous[2]
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.total_size += size
+        while len(self._entries) > self.max_entries or (self.max_size is not None and self.total_size > self.max_size):
+            self.total_size -= self._entries.popitem(last=False)[1][2]
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self.total_size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)